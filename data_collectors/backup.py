@@ -0,0 +1,54 @@
+from utils.aws_clients import get_client
+from data_collectors.records import NOT_AVAILABLE
+from utils import settings
+from datetime import datetime, timedelta, timezone
+
+
+def _retention_days(recovery_point):
+    lifecycle = recovery_point.get('Lifecycle') or recovery_point.get('CalculatedLifecycle') or {}
+    return lifecycle.get('DeleteAfterDays', NOT_AVAILABLE)
+
+
+#AWS Backup index
+#    Parameters:
+#     - resource_type (str): AWS Backup resource type (e.g., 'EC2', 'RDS')
+#     - lookback_days (int): How far back to look for backup jobs (default: BACKUP_LOOKBACK_DAYS)
+#
+#     Returns:
+#     - dict: resource ARN -> (job, retention_days), where job is the latest successful
+#       backup job, or the latest job of any state if none succeeded
+#
+#     One paginated sweep of the backup jobs and one recovery point listing per vault,
+#     instead of two calls per resource.
+
+def get_backup_index(resource_type, lookback_days=None):
+    backup = get_client('backup')
+    since = datetime.now(timezone.utc) - timedelta(days=lookback_days or settings.BACKUP_LOOKBACK_DAYS)
+
+    latest = {}
+    jobs = backup.get_paginator('list_backup_jobs')
+    for page in jobs.paginate(ByResourceType=resource_type, ByCreatedAfter=since):
+        for job in page.get('BackupJobs', []):
+            arn = job['ResourceArn']
+            current = latest.get(arn)
+            #A successful job always wins over a failed one, then the newest wins
+            rank = (job['State'] == 'COMPLETED', job['CreationDate'])
+            if current is None or rank > (current['State'] == 'COMPLETED', current['CreationDate']):
+                latest[arn] = job
+
+    retention = {}
+    vaults = backup.get_paginator('list_backup_vaults')
+    recovery_points = backup.get_paginator('list_recovery_points_by_backup_vault')
+    wanted = {job.get('RecoveryPointArn') for job in latest.values()}
+    for vault_page in vaults.paginate():
+        for vault in vault_page.get('BackupVaultList', []):
+            for page in recovery_points.paginate(BackupVaultName=vault['BackupVaultName'],
+                                                 ByResourceType=resource_type, ByCreatedAfter=since):
+                for recovery_point in page.get('RecoveryPoints', []):
+                    if recovery_point['RecoveryPointArn'] in wanted:
+                        retention[recovery_point['RecoveryPointArn']] = _retention_days(recovery_point)
+
+    return {
+        arn: (job, retention.get(job.get('RecoveryPointArn'), NOT_AVAILABLE))
+        for arn, job in latest.items()
+    }
@@ -1,4 +1,6 @@
-import boto3
+from utils.aws_clients import get_client
+from data_collectors.inventory import list_eks_clusters
+from data_collectors.records import ERROR, EksRow
 
 
 def get_kubernetes_support_period(version):
@@ -15,64 +17,56 @@ def get_kubernetes_support_period(version):
     return version_support.get(version, "Unknown/Expired")
 
 
+def _describe_cluster(eks, name):
+    try:
+        print(f"Processing EKS cluster: {name}")
+
+        desc_response = eks.describe_cluster(name=name)
+        desc = desc_response['cluster']
+
+        version = desc['version']
+        status = desc['status']
+        support_period = get_kubernetes_support_period(version)
+
+        #Get node groups
+        try:
+            nodegroup_response = eks.list_nodegroups(clusterName=name)
+            node_groups = tuple(nodegroup_response.get('nodegroups', []))
+        except Exception as ng_error:
+            print(f"Error fetching node groups for {name}: {ng_error}")
+            node_groups = ERROR
+
+        eks_info = EksRow(
+            cluster_name=name,
+            kubernetes_version=version,
+            support_period=support_period,
+            node_groups=node_groups,
+            status=status,
+        )
+
+        print(f"Collected EKS info for: {name}")
+        return eks_info
+
+    except Exception as cluster_error:
+        print(f"Error fetching EKS cluster {name}: {cluster_error}")
+        # error entry
+        return EksRow(name, ERROR, ERROR, ERROR, ERROR)
+
+
 #EKS Cluster data pull
-def get_eks_clusters_with_metrics():
+#    inventory: shared account inventory; the clusters are listed here when it is not given
+def get_eks_clusters_with_metrics(inventory=None):
     try:
-        eks = boto3.client('eks')
+        eks = get_client('eks')
         print("Fetching EKS clusters...")
 
-        cluster_names_response = eks.list_clusters()
-        cluster_names = cluster_names_response.get('clusters', [])
+        cluster_names = inventory.eks_clusters if inventory is not None else list_eks_clusters()
 
         if not cluster_names:
             print("No EKS clusters found")
             return []
 
-        eks_data = []
-
-        for name in cluster_names:
-            try:
-                print(f"Processing EKS cluster: {name}")
-
-                desc_response = eks.describe_cluster(name=name)
-                desc = desc_response['cluster']
-
-                version = desc['version']
-                status = desc['status']
-                support_period = get_kubernetes_support_period(version)
-
-                #Get node groups
-                try:
-                    nodegroup_response = eks.list_nodegroups(clusterName=name)
-                    nodegroup_names = nodegroup_response.get('node_groups', [])
-                    node_groups_str = ', '.join(nodegroup_names) if nodegroup_names else 'None'
-                except Exception as ng_error:
-                    print(f"Error fetching node groups for {name}: {ng_error}")
-                    node_groups_str = 'Error fetching'
-
-                eks_info = {
-                    'cluster_name': name,
-                    'kubernetes_version': version,
-                    'support_period': support_period,
-                    'node_groups': node_groups_str,
-                    'status': status
-                }
-
-                print(f"Collected EKS info for: {name}")
-                eks_data.append(eks_info)
-
-            except Exception as cluster_error:
-                print(f"Error fetching EKS cluster {name}: {cluster_error}")
-                # error entry
-                eks_data.append({
-                    'cluster_name': name,
-                    'kubernetes_version': 'Error',
-                    'support_period': 'Error',
-                    'node_groups': 'Error',
-                    'status': 'Error'
-                })
-
-        return eks_data
+        return [_describe_cluster(eks, name) for name in cluster_names]
 
     except Exception as e:
         print(f"Error accessing EKS service: {str(e)}")
@@ -80,4 +74,4 @@ def get_eks_clusters_with_metrics():
         print("   - EKS service not available in this region")
         print("   - Insufficient IAM permissions")
         print("   - EKS service not enabled")
-        return []
\ No newline at end of file
+        return []
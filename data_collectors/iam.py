@@ -1,61 +1,135 @@
-import boto3
+from utils.aws_clients import get_client
+from data_collectors.records import ERROR, NOT_AVAILABLE, IamRow
+import csv
+import io
+import time
 from datetime import datetime, timezone
 
+#How long to wait for IAM to generate the credential report
+CREDENTIAL_REPORT_TIMEOUT = 120
+
+
+#Per-user lookup: three IAM calls per user
+def _collect_user(iam, username):
+    #Get groups
+    groups_response = iam.list_groups_for_user(UserName=username)
+    groups = tuple(g['GroupName'] for g in groups_response['Groups'])
+
+    #MFA status
+    mfa_response = iam.list_mfa_devices(UserName=username)
+    mfa_enabled = bool(mfa_response['MFADevices'])
+
+    #Access key age
+    key_response = iam.list_access_keys(UserName=username)
+    key_ages = []
+    for key in key_response['AccessKeyMetadata']:
+        if key['Status'] == 'Active':
+            age_days = (datetime.now(timezone.utc) - key['CreateDate']).days
+            key_ages.append(age_days)
+
+    active_key_age = min(key_ages) if key_ages else NOT_AVAILABLE
+
+    return IamRow(
+        username=username,
+        groups=groups,
+        mfa=mfa_enabled,
+        active_key_age_days=active_key_age,
+    )
+
+
+def _error_entry(username):
+    return IamRow(username, ERROR, ERROR, ERROR)
+
+
+#Credential report rows keyed by username (generates a new report if the current one is stale)
+def get_credential_report(iam):
+    deadline = time.monotonic() + CREDENTIAL_REPORT_TIMEOUT
+    while iam.generate_credential_report()['State'] != 'COMPLETE':
+        if time.monotonic() > deadline:
+            raise TimeoutError("Credential report was not generated in time")
+        time.sleep(2)
+
+    content = iam.get_credential_report()['Content'].decode('utf-8')
+    return {row['user']: row for row in csv.DictReader(io.StringIO(content))}
+
+
+def _report_key_age(row, now):
+    key_ages = []
+    for index in (1, 2):
+        if row.get(f'access_key_{index}_active') != 'true':
+            continue
+        rotated = row.get(f'access_key_{index}_last_rotated', 'N/A')
+        if rotated not in ('N/A', 'not_supported', ''):
+            key_ages.append((now - datetime.fromisoformat(rotated)).days)
+    return min(key_ages) if key_ages else NOT_AVAILABLE
+
+
+#IAM User data pull (bulk)
+#    MFA and key ages come from the credential report and group membership from
+#    GetAccountAuthorizationDetails, joined by username. This costs a handful of calls
+#    regardless of the number of users. Users newer than the report are looked up one by one.
+
+def get_iam_users_bulk():
+    iam = get_client('iam')
+    print("Fetching IAM credential report...")
+    report = get_credential_report(iam)
+    now = datetime.now(timezone.utc)
+    iam_data = []
+
+    paginator = iam.get_paginator('get_account_authorization_details')
+    for page in paginator.paginate(Filter=['User']):
+        for user in page['UserDetailList']:
+            username = user['UserName']
+            row = report.get(username)
+
+            if row is None:
+                print(f"{username} is not in the credential report yet, looking up individually")
+                try:
+                    iam_data.append(_collect_user(iam, username))
+                except Exception as user_error:
+                    print(f"Error processing user {username}: {user_error}")
+                    iam_data.append(_error_entry(username))
+                continue
+
+            iam_data.append(IamRow(
+                username=username,
+                groups=tuple(user.get('GroupList', [])),
+                mfa=row.get('mfa_active') == 'true',
+                active_key_age_days=_report_key_age(row, now),
+            ))
+
+    print(f"Collected IAM metrics for {len(iam_data)} users")
+    return iam_data
+
+
 #IAM User data pull
-def get_iam_users_with_metrics():
+def get_iam_users_with_metrics(bulk=True):
+    if bulk:
+        try:
+            return get_iam_users_bulk()
+        except Exception as e:
+            print(f"Bulk IAM collection failed ({e}), falling back to per-user lookups")
+
     try:
-        iam = boto3.client('iam')
-        users_response = iam.list_users()
+        iam = get_client('iam')
         iam_data = []
 
-        for user in users_response['Users']:
-            username = user['UserName']
-            print(f"Processing IAM user: {username}")
-
-            try:
-                #Get groups
-                groups_response = iam.list_groups_for_user(UserName=username)
-                groups = [g['GroupName'] for g in groups_response['Groups']]
-                group_str = ', '.join(groups) if groups else 'None'
-
-                #MFA status
-                mfa_response = iam.list_mfa_devices(UserName=username)
-                mfa_status = 'Enabled' if mfa_response['MFADevices'] else 'Disabled'
-
-                #Access key age
-                key_response = iam.list_access_keys(UserName=username)
-                key_ages = []
-                for key in key_response['AccessKeyMetadata']:
-                    if key['Status'] == 'Active':
-                        age_days = (datetime.now(timezone.utc) - key['CreateDate']).days
-                        key_ages.append(age_days)
-
-                active_key_age = min(key_ages) if key_ages else "No active keys"
-
-                iam_info = {
-                    'username': username,
-                    'groups': group_str,
-                    'mfa': mfa_status,
-                    'active_key_age_(days)': active_key_age
-                }
-
-                iam_data.append(iam_info)
-                print(f"Collected IAM metrics for: {username}")
-
-            except Exception as user_error:
-                print(f"Error processing user {username}: {user_error}")
-                #error entry
-                iam_data.append({
-                    'username': username,
-                    'groups': 'Error',
-                    'mfa': 'Error',
-                    'active_key_age_(days)': 'Error'
-                })
+        for page in iam.get_paginator('list_users').paginate():
+            for user in page['Users']:
+                username = user['UserName']
+                print(f"Processing IAM user: {username}")
+
+                try:
+                    iam_data.append(_collect_user(iam, username))
+                    print(f"Collected IAM metrics for: {username}")
+
+                except Exception as user_error:
+                    print(f"Error processing user {username}: {user_error}")
+                    #error entry
+                    iam_data.append(_error_entry(username))
 
         return iam_data
 
     except Exception as e:
         print(f"❌ Error getting IAM users: {str(e)}")
         return []
-
-
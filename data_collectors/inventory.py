@@ -0,0 +1,139 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+from utils.aws_clients import current_account_id, current_region, get_client
+
+
+#Typed resource records shared by the metric, backup and table stages
+
+class Ec2Instance(NamedTuple):
+    instance_id: str
+    name: str
+    instance_type: str
+    state: str
+    image_id: str
+    arn: Optional[str]
+
+
+class DbInstance(NamedTuple):
+    identifier: str
+    db_name: str
+    engine: str
+    engine_version: str
+    status: str
+    allocated_storage: int
+    backup_retention_days: int
+    arn: str
+
+
+class Inventory(NamedTuple):
+    account_id: Optional[str]
+    region: Optional[str]
+    ec2_instances: Tuple[Ec2Instance, ...]
+    db_instances: Tuple[DbInstance, ...]
+    eks_clusters: Tuple[str, ...]
+
+
+def get_account_id():
+    return current_account_id()
+
+
+#Instance states listed by the inventory; terminated and shutting-down instances are filtered
+#out by EC2 itself
+EC2_LISTED_STATES = ['pending', 'running', 'stopping', 'stopped']
+
+
+#EC2 instances in the account (every page, terminated instances excluded)
+def list_ec2_instances(account_id=None):
+    ec2 = get_client('ec2')
+    region = current_region()
+    instances = []
+    pages = ec2.get_paginator('describe_instances').paginate(
+        Filters=[{'Name': 'instance-state-name', 'Values': EC2_LISTED_STATES}])
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                instance_id = instance['InstanceId']
+                #Get instance name from tags
+                tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                arn = f"arn:aws:ec2:{region}:{account_id}:instance/{instance_id}" if account_id else None
+                instances.append(Ec2Instance(
+                    instance_id=instance_id,
+                    name=tags.get('Name', instance_id),
+                    instance_type=instance['InstanceType'],
+                    state=instance['State']['Name'],
+                    image_id=instance.get('ImageId', 'N/A'),
+                    arn=arn,
+                ))
+    return instances
+
+
+#DB instances in the account (every page)
+def list_db_instances():
+    rds = get_client('rds')
+    databases = []
+    for page in rds.get_paginator('describe_db_instances').paginate():
+        for db in page.get('DBInstances', []):
+            databases.append(DbInstance(
+                identifier=db['DBInstanceIdentifier'],
+                db_name=db.get('DBName', 'N/A'),
+                engine=db['Engine'],
+                engine_version=db.get('EngineVersion', ''),
+                status=db['DBInstanceStatus'],
+                allocated_storage=db['AllocatedStorage'],
+                backup_retention_days=db.get('BackupRetentionPeriod', 0),
+                arn=db.get('DBInstanceArn', ''),
+            ))
+    return databases
+
+
+#EKS cluster names in the account (every page)
+def list_eks_clusters():
+    eks = get_client('eks')
+    clusters = []
+    for page in eks.get_paginator('list_clusters').paginate():
+        clusters.extend(page.get('clusters', []))
+    return clusters
+
+
+def _attempt(description, func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        print(f"Error listing {description}: {e}")
+        return []
+
+
+#Account inventory
+#    Pages through each describe/list API once. Listings run concurrently; a listing that
+#    fails is reported and left empty, like the collectors did on error.
+
+def collect_inventory():
+    print("Collecting account inventory...")
+    try:
+        account_id = get_account_id()
+    except Exception as e:
+        print(f"Error getting account ID: {e}")
+        account_id = None
+
+    #Each listing runs in a copy of the caller's context so it targets the same account and region
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        def submit(*args):
+            return executor.submit(contextvars.copy_context().run, _attempt, *args)
+
+        ec2_instances = submit("EC2 instances", list_ec2_instances, account_id)
+        db_instances = submit("RDS instances", list_db_instances)
+        eks_clusters = submit("EKS clusters", list_eks_clusters)
+
+        inventory = Inventory(
+            account_id=account_id,
+            region=current_region(),
+            ec2_instances=tuple(ec2_instances.result()),
+            db_instances=tuple(db_instances.result()),
+            eks_clusters=tuple(eks_clusters.result()),
+        )
+
+    print(f"Inventory: {len(inventory.ec2_instances)} EC2 instances, {len(inventory.db_instances)} RDS instances, "
+          f"{len(inventory.eks_clusters)} EKS clusters")
+    return inventory
@@ -1,45 +1,74 @@
-from utils.cloudwatch import get_cloudwatch_metric
+from utils.metric_store import HOUR, MONTH, get_latest_values, prefetch
 from datetime import datetime, timezone
-import boto3
+from utils.aws_clients import get_client
+from data_collectors.inventory import list_db_instances
+from data_collectors.records import ERROR, NOT_AVAILABLE, RdsBackupRow, RdsRow, is_number
+
+#Every AWS/RDS series the report reads per DB instance (table values and monthly graphs)
+RDS_METRICS = ['CPUUtilization', 'FreeStorageSpace', 'FreeableMemory']
+
+#Newest automated snapshot per DB instance, from one paginated sweep of all snapshots
+def get_latest_snapshots():
+    rds = get_client('rds')
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    latest = {}
+    for page in rds.get_paginator('describe_db_snapshots').paginate(SnapshotType='automated'):
+        for snapshot in page.get('DBSnapshots', []):
+            db_name = snapshot.get('DBInstanceIdentifier')
+            current = latest.get(db_name)
+            if current is None or (snapshot.get('SnapshotCreateTime', oldest) >
+                                   current.get('SnapshotCreateTime', oldest)):
+                latest[db_name] = snapshot
+    return latest
+
 
 #RDS Data pull
-def get_rds_instances_with_metrics():
+#    inventory: shared account inventory; the instances are listed here when it is not given
+def get_rds_instances_with_metrics(inventory=None):
     try:
-        rds = boto3.client('rds')
-        response = rds.describe_db_instances()
+        db_instances = inventory.db_instances if inventory is not None else list_db_instances()
         rds_data = []
 
-        for db in response['DBInstances']:
-            #Skip instances that are not available
-            if db['DBInstanceStatus'] not in ['available', 'backing-up', 'modifying']:
-                continue
-
-            db_id = db['DBInstanceIdentifier']
-            allocated_storage = db['AllocatedStorage']
+        #Skip instances that are not available
+        databases = [
+            db for db in db_instances
+            if db.status in ['available', 'backing-up', 'modifying']
+        ]
+
+        #The 30-day hourly series also serves the monthly graphs from the metric store
+        series = [
+            (db.identifier, metric_name, 'AWS/RDS', 'DBInstanceIdentifier')
+            for db in databases
+            for metric_name in RDS_METRICS
+        ]
+        prefetch(series, MONTH, HOUR)
+        metric_values = get_latest_values(series)
+
+        for db in databases:
+            db_id = db.identifier
+            allocated_storage = db.allocated_storage
 
             print(f"Processing RDS instance: {db_id}")
 
-            cpu = get_cloudwatch_metric(db_id, 'CPUUtilization', namespace='AWS/RDS',
-                                        dimension_name='DBInstanceIdentifier')
-            free_storage = get_cloudwatch_metric(db_id, 'FreeStorageSpace', namespace='AWS/RDS',
-                                                 dimension_name='DBInstanceIdentifier')
+            cpu = metric_values[(db_id, 'CPUUtilization', 'AWS/RDS', 'DBInstanceIdentifier')]
+            free_storage = metric_values[(db_id, 'FreeStorageSpace', 'AWS/RDS', 'DBInstanceIdentifier')]
 
             #Calculate storage usage
-            if free_storage not in ["N/A", "Error"]:
+            if is_number(free_storage):
                 free_storage_gb = round(free_storage / (1024 ** 3), 2)
                 used_storage_gb = round(allocated_storage - free_storage_gb, 2)
-                used_storage_str = f"{used_storage_gb} GB / {allocated_storage} GB"
             else:
-                used_storage_str = f"N/A / {allocated_storage} GB"
-
-            rds_info = {
-                'db_identifier': db_id,
-                'database_name': db.get('DBName', 'N/A'),
-                'engine': f"{db['Engine']} {db.get('EngineVersion', '')}".strip(),
-                'status': db['DBInstanceStatus'],
-                'storage_used/allocated': used_storage_str,
-                'monthly_cpu_usage_(%)': f"{cpu}%" if cpu not in ["N/A", "Error"] else cpu,
-            }
+                used_storage_gb = free_storage
+
+            rds_info = RdsRow(
+                db_identifier=db_id,
+                database_name=db.db_name,
+                engine=f"{db.engine} {db.engine_version}".strip(),
+                status=db.status,
+                storage_used_gb=used_storage_gb,
+                storage_allocated_gb=allocated_storage,
+                cpu=cpu,
+            )
 
             print(f"Collected RDS metrics for: {db_id}")
             rds_data.append(rds_info)
@@ -50,87 +79,76 @@ def get_rds_instances_with_metrics():
         print(f"Error getting RDS instances: {str(e)}")
         return []
 
-def get_rds_backup_metrics():
+
+def _backup_row(instance, snapshot):
+    db_name = instance.identifier
+    if snapshot:
+        snapshot_id = snapshot.get('DBSnapshotIdentifier', NOT_AVAILABLE)
+        snapshot_date = snapshot.get('SnapshotCreateTime', NOT_AVAILABLE)
+        snapshot_status = snapshot.get('Status', NOT_AVAILABLE)
+        size_gb = snapshot.get('AllocatedStorage', 0)
+
+        print(f"Found snapshot: {snapshot_id} from {snapshot_date}")
+    else:
+        snapshot_id = NOT_AVAILABLE
+        snapshot_date = NOT_AVAILABLE
+        snapshot_status = "No automated backups"
+        size_gb = 0
+        print(f"No automated snapshots found for {db_name}")
+
+    return RdsBackupRow(
+        db_name=db_name,
+        snapshot_id=snapshot_id,
+        date=snapshot_date,
+        status=snapshot_status,
+        #Retention period from instance settings
+        retention_days=instance.backup_retention_days,
+        size_gb=size_gb if size_gb > 0 else NOT_AVAILABLE,
+    )
+
+
+#RDS backup data pull
+#    inventory: shared account inventory; the instances are listed here when it is not given
+def get_rds_backup_metrics(inventory=None):
     try:
-        rds = boto3.client('rds')
         print("Fetching RDS backup information...")
 
         # Get all RDS instances first
-        instances_response = rds.describe_db_instances()
-        instances = instances_response.get('DBInstances', [])
+        instances = inventory.db_instances if inventory is not None else list_db_instances()
 
         if not instances:
             print("No RDS instances found")
             return []
 
+        #Newest automated snapshot of every instance
+        try:
+            latest_snapshots = get_latest_snapshots()
+            snapshots_error = None
+        except Exception as snapshot_error:
+            print(f"Error listing RDS snapshots: {snapshot_error}")
+            latest_snapshots = {}
+            snapshots_error = snapshot_error
         backup_data = []
 
         for instance in instances:
-            db_name = instance['DBInstanceIdentifier']
+            db_name = instance.identifier
             print(f"Checking backups for RDS: {db_name}")
 
-            try:
-                #Get automated snapshots for specific DB instance
-                snapshots_response = rds.describe_db_snapshots(
-                    DBInstanceIdentifier=db_name,
-                    SnapshotType='automated',
-                    MaxRecords=20
-                )
-                snapshots = snapshots_response.get('DBSnapshots', [])
-
-                if snapshots:
-                    #Get the most recent snapshot
-                    snapshots.sort(key=lambda x: x.get('SnapshotCreateTime', datetime.min.replace(tzinfo=timezone.utc)),
-                                   reverse=True)
-                    snapshot = snapshots[0]
-
-                    snapshot_id = snapshot.get('DBSnapshotIdentifier', 'N/A')
-                    snapshot_date = snapshot.get('SnapshotCreateTime', 'N/A')
-                    snapshot_status = snapshot.get('Status', 'N/A')
-                    size_gb = snapshot.get('AllocatedStorage', 0)
-
-                    #Format date
-                    if snapshot_date != 'N/A':
-                        date_str = snapshot_date.strftime("%Y-%m-%d %H:%M")
-                    else:
-                        date_str = 'N/A'
-
-                    print(f"Found snapshot: {snapshot_id} from {date_str}")
-                else:
-                    snapshot_id = "No snapshots"
-                    date_str = "N/A"
-                    snapshot_status = "No automated backups"
-                    size_gb = 0
-                    print(f"No automated snapshots found for {db_name}")
-
-                #Get retention period from instance settings
-                retention = instance.get('BackupRetentionPeriod', 0)
-                retention_str = f"{retention} days" if retention > 0 else "Disabled"
-
-                backup_data.append({
-                    'db_name': db_name,
-                    'snapshot_id': snapshot_id,
-                    'date': date_str,
-                    'status': snapshot_status,
-                    'retention_days': retention_str,
-                    'size_gb': f"{size_gb} GB" if size_gb > 0 else "N/A"
-                })
+            #Without the snapshot listing no instance's backups are known
+            if snapshots_error is not None:
+                backup_data.append(RdsBackupRow(db_name, ERROR, ERROR, ERROR, ERROR, ERROR))
+                continue
 
+            try:
+                backup_data.append(_backup_row(instance, latest_snapshots.get(db_name)))
                 print(f"Collected backup info for RDS: {db_name}")
 
             except Exception as db_error:
                 print(f"Error processing RDS backups for {db_name}: {db_error}")
-                backup_data.append({
-                    'db_name': db_name,
-                    'snapshot_id': 'Error',
-                    'date': 'Error',
-                    'status': 'Error',
-                    'retention_days': 'Error',
-                    'size_gb': 'Error'
-                })
+                backup_data.append(RdsBackupRow(db_name, ERROR, ERROR, ERROR, ERROR, ERROR))
 
         return backup_data
 
     except Exception as e:
         print(f"Error getting RDS backup metrics: {str(e)}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple, Union
+
+
+#Table rows
+#    One record per resource, as the collectors return them. Values keep their type (floats for
+#    metrics, datetimes, day counts, tuples of names) and a value that could not be read is one
+#    of the states below instead of a string. Rows are only turned into cell text by the render
+#    phase, one table page at a time (see report/render.py).
+#
+#    account and region are filled in when rows from several targets are merged.
+
+class State:
+    __slots__ = ('label',)
+
+    def __init__(self, label):
+        self.label = label
+
+    def __repr__(self):
+        return self.label
+
+
+#Nothing to report (no datapoints, no backup, no active key)
+NOT_AVAILABLE = State("N/A")
+#The lookup failed
+ERROR = State("Error")
+
+Number = Union[float, State]
+Text = Union[str, State]
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Ec2Row(NamedTuple):
+    instance_id: str
+    server_name: str
+    specification: str
+    status: str
+    cpu: Number  # %
+    memory: Number  # %
+    disk: Number  # %
+    account: Optional[str] = None
+    region: Optional[str] = None
+
+
+class RdsRow(NamedTuple):
+    db_identifier: str
+    database_name: str
+    engine: str
+    status: str
+    storage_used_gb: Number
+    storage_allocated_gb: int
+    cpu: Number  # %
+    account: Optional[str] = None
+    region: Optional[str] = None
+
+
+class EksRow(NamedTuple):
+    cluster_name: str
+    kubernetes_version: Text
+    support_period: Text
+    node_groups: Union[Tuple[str, ...], State]
+    status: Text
+    account: Optional[str] = None
+    region: Optional[str] = None
+
+
+class IamRow(NamedTuple):
+    username: str
+    groups: Union[Tuple[str, ...], State]
+    mfa: Union[bool, State]
+    active_key_age_days: Union[int, State]  # NOT_AVAILABLE: no active keys
+    account: Optional[str] = None
+    region: Optional[str] = None
+
+
+class Ec2BackupRow(NamedTuple):
+    instance_name: str
+    ami_id: str
+    backup_date: Union[datetime, State]  # NOT_AVAILABLE: no backup found
+    status: Text
+    retention_days: Union[int, State]
+    next_backup: Text
+    account: Optional[str] = None
+    region: Optional[str] = None
+
+
+class RdsBackupRow(NamedTuple):
+    db_name: str
+    snapshot_id: Text  # NOT_AVAILABLE: no snapshot
+    date: Union[datetime, State]
+    status: Text
+    retention_days: Union[int, State]  # 0: backups disabled
+    size_gb: Union[int, State]
+    account: Optional[str] = None
+    region: Optional[str] = None
+
+
+#JSON records
+#    Used by the snapshot files. States and datetimes are written as {"state": label} and
+#    {"time": ISO 8601}; JSON lists are read back as tuples.
+
+def _encode(value):
+    if isinstance(value, State):
+        return {'state': value.label}
+    if isinstance(value, datetime):
+        return {'time': value.isoformat()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if 'state' in value:
+            return ERROR if value['state'] == ERROR.label else NOT_AVAILABLE
+        return datetime.fromisoformat(value['time'])
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def to_record(row):
+    return {field: _encode(value) for field, value in zip(row._fields, row)}
+
+
+def from_record(row_type, record):
+    return row_type(**{field: _decode(value) for field, value in record.items() if field in row_type._fields})
@@ -0,0 +1,209 @@
+from data_collectors.ec2 import EC2_METRICS, get_ec2_instances_with_metrics, get_ec2_backup_metrics
+from data_collectors.eks import get_eks_clusters_with_metrics
+from data_collectors.iam import get_iam_users_with_metrics
+from data_collectors.inventory import collect_inventory
+from data_collectors.records import is_number
+from data_collectors.rds import RDS_METRICS, get_rds_instances_with_metrics, get_rds_backup_metrics
+from utils.metric_store import release
+from utils.monthly_metric import get_monthly_metrics_batch
+from utils.monthly_billing import get_monthly_billing_data
+from utils.optimization_recom import get_aws_optimization_status
+from utils.fanout import account_lane, in_target
+from utils.chart_render import ChartJob
+
+#Collect phase
+#    Everything the report shows, gathered from AWS: table rows, optimization findings, billing
+#    and the chart jobs (title and series) for the graph slides. Nothing here loads python-pptx
+#    or matplotlib; charts are drawn by the render phase (report/render.py).
+
+
+def collect(label, collector, describe, default):
+    #A collector that fails is reported and yields an empty result, so one failing account
+    #or region does not leave the merged slides unfilled
+    def run(*inputs):
+        print(f"\nCollecting {label} data...")
+        try:
+            data = collector(*inputs)
+        except Exception as e:
+            print(f"Error collecting {label} data: {e}")
+            return default
+        print(describe(data))
+        return data
+    return run
+
+
+#Slide labels and chart keys are tagged with the target when several are collected
+def _graph_name(name, target_label):
+    return f"{name} ({target_label})" if target_label else name
+
+
+#(name, ChartJob) pairs for the EC2 graph slides
+def ec2_charts(ec2_data, target_label=None):
+    #Only instances where every metric has a value
+    ec2_graph_ready = [ec2 for ec2 in ec2_data if is_number(ec2.cpu) and is_number(ec2.memory)
+                       and is_number(ec2.disk)]
+
+    #Read every 30-day graph series from the metric store (already filled by the collector)
+    monthly_requests = []
+    for ec2 in ec2_graph_ready:
+        monthly_requests.append((ec2.instance_id, ["CPUUtilization"], "AWS/EC2", "InstanceId"))
+        monthly_requests.append((ec2.instance_id, ["mem_used_percent", "disk_used_percent"], "CWAgent",
+                                 "InstanceId"))
+    monthly_metrics = get_monthly_metrics_batch(monthly_requests)
+    #Nothing reads the instances' series after this
+    release([(ec2.instance_id, metric_name, namespace, "InstanceId")
+             for ec2 in ec2_data for metric_name, namespace in EC2_METRICS])
+
+    charts = []
+    for ec2 in ec2_graph_ready:
+        instance_id = ec2.instance_id
+        server_name = ec2.server_name
+
+        cpu_metrics = monthly_metrics.get((instance_id, "AWS/EC2")) or {}
+        cwagent_metrics = monthly_metrics.get((instance_id, "CWAgent")) or {}
+
+        metrics = {**cpu_metrics, **cwagent_metrics}
+
+        if any(metrics.values()):
+            print(f"Generating graph for: {server_name}")
+            #Keyed by instance ID: two servers can share a name
+            charts.append((_graph_name(server_name, target_label),
+                           ChartJob(_graph_name(instance_id, target_label), 'line',
+                                    f"EC2 Metrics for {server_name}", metrics)))
+        else:
+            print(f"No available metrics to plot for: {server_name}")
+    return charts
+
+
+#(name, ChartJob) pairs for the RDS graph slides
+def rds_charts(rds_data, target_label=None):
+    monthly_metrics = get_monthly_metrics_batch([
+        (rds.db_identifier, ["CPUUtilization", "FreeableMemory"], "AWS/RDS", "DBInstanceIdentifier")
+        for rds in rds_data
+    ])
+    release([(rds.db_identifier, metric_name, "AWS/RDS", "DBInstanceIdentifier")
+             for rds in rds_data for metric_name in RDS_METRICS])
+
+    charts = []
+    for rds in rds_data:
+        #Only RDS instances with all required metrics get a graph
+        metrics = monthly_metrics.get((rds.db_identifier, "AWS/RDS"))
+        if metrics and all(metrics.get(m) for m in ["CPUUtilization", "FreeableMemory"]):
+            name = _graph_name(rds.db_identifier, target_label)
+            charts.append((name, ChartJob(name, 'line', f"RDS Metrics for {rds.db_identifier}", metrics)))
+    return charts
+
+
+#Merging per-target results
+#    Rows from each target have the listed fields ('account', 'region') set and are
+#    concatenated in target order.
+
+def merge_rows(targets, columns):
+    def run(*results):
+        merged = []
+        for target, rows in zip(targets, results):
+            tags = {'account': target.account_id, 'region': target.region}
+            tags = {column: tags[column] for column in columns}
+            merged.extend(row._replace(**tags) if tags else row for row in rows)
+        return merged
+    return run
+
+
+def merge_charts(*results):
+    return [chart for charts in results for chart in charts]
+
+
+#Cost per service, summed across accounts
+def merge_billing(*results):
+    merged = {}
+    for billing_data in results:
+        for service, amount in billing_data.items():
+            merged[service] = merged.get(service, 0.0) + amount
+    return merged
+
+
+def merge_optimization(targets, tag_names):
+    def run(*results):
+        merged = {}
+        for target, categorized in zip(targets, results):
+            for category, names in categorized.items():
+                merged.setdefault(category, []).extend(
+                    _graph_name(name, target.label if tag_names else None) for name in names
+                )
+        return merged
+    return run
+
+
+#Collect tasks
+#    Every collector and chart task runs once per target (account and region) and is named
+#    "<account>/<region>:<task>". Merge tasks then combine the per-target results under the
+#    plain names listed in report.dataset.DATASET, which is what the render phase depends on.
+#    IAM and billing are account-wide, so they run once per account. Tasks against the same
+#    account share its lane (see utils.fanout.account_lane).
+
+def add_collect_tasks(pipeline, targets):
+    multi_target = len(targets) > 1
+    multi_account = len({target.account_id for target in targets}) > 1
+    #First target of every account, for the account-wide collectors
+    account_targets = []
+    for target in targets:
+        if all(target.account_id != seen.account_id for seen in account_targets):
+            account_targets.append(target)
+
+    collectors = {
+        'ec2': ("EC2", get_ec2_instances_with_metrics, lambda data: f"Found {len(data)} EC2 instances"),
+        'rds': ("RDS", get_rds_instances_with_metrics, lambda data: f"Found {len(data)} RDS instances"),
+        'eks': ("EKS", get_eks_clusters_with_metrics, lambda data: f"Found {len(data)} EKS clusters"),
+        'ec2_backup': ("EC2 backup", get_ec2_backup_metrics,
+                       lambda data: f"Found backup info for {len(data)} EC2 instances"),
+        'rds_backup': ("RDS backup", get_rds_backup_metrics,
+                       lambda data: f"Found backup info for {len(data)} RDS instances"),
+    }
+
+    #Inventory, then metrics, backups and chart series for every target
+    for target in targets:
+        def task(name, target=target):
+            return f"{target.label}:{name}"
+
+        target_label = target.label if multi_target else None
+        suffix = f" ({target.label})" if multi_target else ""
+        lanes = [account_lane(pipeline, target)]
+
+        pipeline.add(task("inventory"), in_target(target, collect_inventory), lanes=lanes)
+        for name, (label, collector, describe) in collectors.items():
+            pipeline.add(task(name), in_target(target, collect(label + suffix, collector, describe, [])),
+                         deps=[task("inventory")], lanes=lanes)
+        pipeline.add(task("optimization"), in_target(target, collect(
+            "optimization" + suffix, get_aws_optimization_status,
+            lambda data: "Fetched optimization classifications", {})), lanes=lanes)
+
+        #Chart series (read in the target's scope, which is what the metric store is keyed by)
+        pipeline.add(task("ec2_charts"), in_target(target, lambda data, target_label=target_label:
+                                                   ec2_charts(data, target_label)),
+                     deps=[task("ec2")], lanes=lanes)
+        pipeline.add(task("rds_charts"), in_target(target, lambda data, target_label=target_label:
+                                                   rds_charts(data, target_label)),
+                     deps=[task("rds")], lanes=lanes)
+
+    for target in account_targets:
+        suffix = f" ({target.account_id})" if multi_account else ""
+        lanes = [account_lane(pipeline, target)]
+        pipeline.add(f"{target.label}:iam", in_target(target, collect(
+            "IAM" + suffix, get_iam_users_with_metrics, lambda data: f"Found {len(data)} IAM users", [])),
+            lanes=lanes)
+        pipeline.add(f"{target.label}:billing", in_target(target, collect(
+            "billing" + suffix, get_monthly_billing_data,
+            lambda data: f"Found billing data for {len(data)} services", {})), lanes=lanes)
+
+    #Merged results
+    columns = ['account', 'region'] if multi_target else []
+    for name in collectors:
+        pipeline.add(name, merge_rows(targets, columns), deps=[f"{target.label}:{name}" for target in targets])
+    for name in ["ec2_charts", "rds_charts"]:
+        pipeline.add(name, merge_charts, deps=[f"{target.label}:{name}" for target in targets])
+    pipeline.add("optimization", merge_optimization(targets, multi_target),
+                 deps=[f"{target.label}:optimization" for target in targets])
+    pipeline.add("iam", merge_rows(account_targets, ['account'] if multi_account else []),
+                 deps=[f"{target.label}:iam" for target in account_targets])
+    pipeline.add("billing", merge_billing, deps=[f"{target.label}:billing" for target in account_targets])
+
@@ -0,0 +1,37 @@
+#Collected dataset
+#    What the collect phase hands to the render phase, by name. `main.py collect` saves it as a
+#    snapshot (see report/snapshot.py) for a later `main.py render`.
+
+from data_collectors.records import Ec2BackupRow, Ec2Row, EksRow, IamRow, RdsBackupRow, RdsRow
+
+#Dataset name -> value used when it is missing
+DATASET = {
+    'ec2': [],
+    'rds': [],
+    'eks': [],
+    'iam': [],
+    'ec2_backup': [],
+    'rds_backup': [],
+    'optimization': {},
+    'billing': {},
+    'ec2_charts': [],
+    'rds_charts': [],
+}
+
+#Table datasets and the record type of their rows
+ROWS = {
+    'ec2': Ec2Row,
+    'rds': RdsRow,
+    'eks': EksRow,
+    'iam': IamRow,
+    'ec2_backup': Ec2BackupRow,
+    'rds_backup': RdsBackupRow,
+}
+
+#Datasets holding (name, ChartJob) pairs
+CHARTS = ['ec2_charts', 'rds_charts']
+
+
+#Account and region of every collected target, which decides the extra table columns
+def describe_targets(targets):
+    return [{'account_id': target.account_id, 'region': target.region} for target in targets]
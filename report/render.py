@@ -0,0 +1,289 @@
+import os
+from datetime import datetime
+
+from pptx import Presentation
+
+from data_collectors.records import NOT_AVAILABLE, State
+from utils import settings
+from utils.pipeline import Pipeline
+from utils.chart_render import prepare_charts, shutdown_workers
+from utils.ppt_edit import (
+    add_billing_summary_to_slide,
+    add_optimization_pie_chart,
+    add_table_columns,
+    fill_existing_table,
+    table_rows_per_slide,
+)
+from utils.ppt_edit import grid_layout, insert_chart_to_slide, set_resource_name, update_textbox_with_resource_name
+from utils.ppt_edit import update_resource_counts_on_slide
+from utils.packaging import save_presentation
+from utils.slide_clone import clone_slide
+from utils.template_index import find_shape, load_template_index
+
+#Render phase
+#    Draws the charts and fills the template from a collected dataset (see report/dataset.py).
+#    Nothing here talks to AWS or loads boto3.
+
+#Lanes serialize tasks that share state which is not thread safe
+SLIDES = "slides"  # the presentation
+
+#Text on each template slide the report fills, used to find it in the template index
+SLIDE_ROLES = {
+    'counts': "Executive Summary",
+    'ec2_graphs': "server name:",
+    'rds_graphs': "RDS Name:",
+    'optimization': "Resource distribution",
+    'billing': "Billing Summary",
+}
+
+#Cell text
+#    Rows keep typed values (see data_collectors/records.py) until a table page is written; these
+#    turn one value into its cell. missing is shown for NOT_AVAILABLE, "Error" for ERROR.
+
+def cell(value, missing="N/A", unit="", date_format="%Y-%m-%d %H:%M"):
+    if isinstance(value, State):
+        return missing if value is NOT_AVAILABLE else value.label
+    if isinstance(value, bool):
+        return "Enabled" if value else "Disabled"
+    if isinstance(value, tuple):
+        return ", ".join(value) if value else "None"
+    if isinstance(value, datetime):
+        return value.strftime(date_format)
+    if value is None:
+        return missing
+    return f"{value}{unit}"
+
+
+def ec2_cells(row):
+    return [row.server_name, row.specification, row.status,
+            cell(row.cpu, unit="%"), cell(row.memory, unit="%"), cell(row.disk, unit="%")]
+
+
+def rds_cells(row):
+    return [row.db_identifier, row.database_name, row.engine, row.status,
+            f"{cell(row.storage_used_gb, unit=' GB')} / {row.storage_allocated_gb} GB",
+            cell(row.cpu, unit="%")]
+
+
+def eks_cells(row):
+    return [row.cluster_name, cell(row.kubernetes_version), cell(row.support_period), cell(row.node_groups)]
+
+
+def iam_cells(row):
+    return [row.username, cell(row.groups), cell(row.mfa), cell(row.active_key_age_days, "No active keys")]
+
+
+def ec2_backup_cells(row):
+    return [row.instance_name, row.ami_id,
+            cell(row.backup_date, "No backups found", date_format="%Y-%m-%d %H:%M:%S"),
+            cell(row.status), cell(row.retention_days), cell(row.next_backup)]
+
+
+def rds_backup_cells(row):
+    if isinstance(row.retention_days, State):
+        retention = cell(row.retention_days)
+    else:
+        retention = f"{row.retention_days} days" if row.retention_days > 0 else "Disabled"
+    return [row.db_name, cell(row.snapshot_id, "No snapshots"), cell(row.date), cell(row.status), retention,
+            cell(row.size_gb, unit=" GB")]
+
+
+#Table slide title -> (dataset name, cell text of a row in column order)
+TABLE_SLIDES = {
+    'EC2 Instances': ('ec2', ec2_cells),
+    'Relational Databases': ('rds', rds_cells),
+    'EKS Clusters': ('eks', eks_cells),
+    'IAM Users': ('iam', iam_cells),
+    'EC2 Backups': ('ec2_backup', ec2_backup_cells),
+    'RDS Backup': ('rds_backup', rds_backup_cells),
+}
+
+
+#Render (name, ChartJob) pairs in the chart workers
+#    Returns:
+#     - list: (name, job, PNG bytes or None for native charts) for the charts that are ready
+
+def render_graphs(charts):
+    prepared = prepare_charts([job for _, job in charts])
+    return [(name, job, prepared[job.key]) for name, job in charts if job.key in prepared]
+
+
+#Chart slides are left as they are in the template when there is nothing to chart
+def fill_chart_slide(label, data, fill, *args, **kwargs):
+    if not data:
+        print(f"No {label} data, leaving the slide unchanged")
+        return
+    fill(*args, **kwargs)
+
+
+#Graph slides
+#    The template slide is copied once per page of GRAPHS_PER_SLIDE graphs, laid out in a grid,
+#    and the copies follow the template slide in the deck. Copies are made before any page is
+#    filled, so each one starts from the untouched template.
+
+def add_graphs_to_slide(prs, index, slide, graphs, label_prefix):
+    per_slide = max(1, settings.GRAPHS_PER_SLIDE)
+    pages = [graphs[start:start + per_slide] for start in range(0, len(graphs), per_slide)]
+    if not pages:
+        return
+
+    label_id = index.label_shape_id(slide, label_prefix)
+    slides = [slide] + clone_slide(prs, slide, len(pages) - 1)
+    print(f"Adding {len(graphs)} graphs on {len(slides)} slides")
+    for page_slide, page in zip(slides, pages):
+        names = [resource_name for resource_name, _, _ in page]
+        label = names[0] if len(names) == 1 else f"{names[0]} - {names[-1]}"
+        label_shape = find_shape(page_slide, label_id) if label_id is not None else None
+        if label_shape is not None:
+            set_resource_name(label_shape, label_prefix, label)
+        else:
+            update_textbox_with_resource_name(page_slide, label_prefix, label)
+        for (resource_name, job, png), position in zip(page, grid_layout(prs, len(page))):
+            insert_chart_to_slide(page_slide, job, png, prs, **position)
+
+
+#Table slides
+#    Rows that do not fit on the template slide continue on copies of it, placed right after
+#    it. The page size is TABLE_ROWS_PER_SLIDE, or as many rows as fit below the table's top
+#    when that is 0.
+#
+#    cells: cell text of a row, in the template's column order
+#    extra_columns: (row field, header) columns inserted in front of the template's columns
+
+def fill_table_slide(prs, index, slide_title, data, cells, extra_columns=()):
+    print(f"\nLooking for slide: '{slide_title}'")
+
+    #Rows become text one page at a time, as the page is written
+    def page_rows(page):
+        return [[cell(getattr(row, field)) for field, _ in extra_columns] + cells(row) for row in page]
+
+    slide = index.slide(slide_title)
+    if slide:
+        print(f"Updating slide: '{slide_title}'")
+        try:
+            table_shape = index.table(slide)
+            if table_shape is None:
+                fill_existing_table(slide, page_rows(data), slide_title)
+                return
+            if extra_columns:
+                add_table_columns(table_shape.table, [header for _, header in extra_columns])
+
+            per_slide = settings.TABLE_ROWS_PER_SLIDE or table_rows_per_slide(prs, table_shape)
+            pages = [data[start:start + per_slide] for start in range(0, len(data), per_slide)] or [data]
+            #Copies are made before the template slide's table is filled
+            slides = [slide] + clone_slide(prs, slide, len(pages) - 1)
+            if len(slides) > 1:
+                print(f"Splitting {len(data)} rows over {len(slides)} slides")
+            for page_slide, page in zip(slides, pages):
+                fill_existing_table(page_slide, page_rows(page), slide_title)
+        except Exception as e:
+            print(f"Error updating slide '{slide_title}': {e}")
+    else:
+        print(f"Could not find slide with title: '{slide_title}'")
+
+
+#Render tasks
+#    Graphs for a service are rendered as soon as that service's chart series are in, and each
+#    slide is filled as soon as its inputs are ready. The tasks depend on the dataset names in
+#    report.dataset.DATASET, whether they come from the collect tasks in the same pipeline or
+#    from a saved dataset.
+#
+#    targets: as written by report.dataset.describe_targets
+
+def add_render_tasks(pipeline, prs, index, targets):
+    multi_target = len(targets) > 1
+    multi_account = len({target['account_id'] for target in targets}) > 1
+
+    pipeline.add("ec2_graphs", render_graphs, deps=["ec2_charts"])
+    pipeline.add("rds_graphs", render_graphs, deps=["rds_charts"])
+
+    #Template slides are looked up now, by their content: graph pages inserted while the
+    #pipeline runs shift the position of every slide after them
+    slides = {}
+    for role, text in SLIDE_ROLES.items():
+        slides[role] = index.slide(text)
+        if slides[role] is None:
+            print(f"Could not find slide with text: '{text}'")
+
+    def add_slide_task(name, role, fill, deps):
+        if slides[role] is not None:
+            pipeline.add(name, fill, deps=deps, lanes=[SLIDES])
+
+    add_slide_task("counts_slide", 'counts', lambda ec2_data, rds_data: update_resource_counts_on_slide(
+        prs,
+        slide_index=prs.slides.index(slides['counts']),
+        ec2_count=len(ec2_data),
+        rds_count=len(rds_data),
+    ), deps=["ec2", "rds"])
+    add_slide_task("optimization_slide", 'optimization', lambda categorized_resources: fill_chart_slide(
+        "optimization", categorized_resources, add_optimization_pie_chart,
+        prs, slide_index=prs.slides.index(slides['optimization']), categorized_resources=categorized_resources
+    ), deps=["optimization"])
+    add_slide_task("ec2_graphs_slide", 'ec2_graphs', lambda graphs: add_graphs_to_slide(
+        prs, index, slides['ec2_graphs'], graphs, SLIDE_ROLES['ec2_graphs']), deps=["ec2_graphs"])
+    add_slide_task("rds_graphs_slide", 'rds_graphs', lambda graphs: add_graphs_to_slide(
+        prs, index, slides['rds_graphs'], graphs, SLIDE_ROLES['rds_graphs']), deps=["rds_graphs"])
+
+    #Account and region columns are only added when more than one target was collected
+    extra_columns = [('account', 'Account'), ('region', 'Region')] if multi_target else []
+    iam_columns = [('account', 'Account')] if multi_account else []
+    for slide_title, (source, cells) in TABLE_SLIDES.items():
+        columns = iam_columns if source == 'iam' else extra_columns
+        pipeline.add(f"table:{slide_title}",
+                     lambda data, slide_title=slide_title, cells=cells, columns=columns: fill_table_slide(
+                         prs, index, slide_title, data, cells, columns),
+                     deps=[source], lanes=[SLIDES])
+
+    add_slide_task("billing_slide", 'billing', lambda billing_data: fill_chart_slide(
+        "billing", billing_data, add_billing_summary_to_slide,
+        prs, slide_index=prs.slides.index(slides['billing']), billing_data=billing_data
+    ), deps=["billing"])
+
+
+def save_report(prs, output_filename):
+    print(f"\nSaving presentation...")
+    try:
+        save_presentation(prs, output_filename)
+        print(f"Report saved as: {output_filename}")
+        print(f"Report generation completed successfully!")
+    except Exception as e:
+        print(f"Error saving presentation: {e}")
+        try:
+            fallback_filename = f"output/fallback_{os.path.basename(output_filename)}"
+            prs.save(fallback_filename)
+            print(f"Report saved as: {fallback_filename}")
+        except Exception as e2:
+            print(f"Failed to save presentation: {e2}")
+
+
+#Fill the template and save the report
+#    Parameters:
+#     - path (str): Path to the .pptx template
+#     - output_filename (str): Where to save the report
+#     - targets (list): Collected targets, as written by report.dataset.describe_targets
+#     - add_inputs (function): Adds the tasks producing the dataset to the pipeline, given the
+#       pipeline (the collect tasks, or the values of a saved dataset)
+
+def render_report(path, output_filename, targets, add_inputs):
+    print(f"Loading template from: {path}")
+    try:
+        prs = Presentation(path)
+        print("Template loaded successfully")
+    except Exception as e:
+        print(f"Error loading template: {e}")
+        return
+
+    if os.path.dirname(output_filename):
+        os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+
+    pipeline = Pipeline(max_workers=settings.PIPELINE_WORKERS)
+    add_inputs(pipeline)
+    add_render_tasks(pipeline, prs, load_template_index(prs, path), targets)
+
+    print("\nUpdating PowerPoint slides...")
+    try:
+        pipeline.run(keep=())
+    finally:
+        shutdown_workers()
+
+    save_report(prs, output_filename)
@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import sys
+from array import array
+from datetime import datetime, timezone
+
+from data_collectors.records import from_record, to_record
+from utils import settings
+from utils.chart_render import ChartJob
+from utils.pipeline import Pipeline
+from report.dataset import CHARTS, DATASET, ROWS
+
+#Collection snapshots
+#    What `main.py collect` saves and `main.py render` builds the report from. A snapshot is a
+#    directory:
+#     - manifest.json: format, version, creation time, collected targets and the files below
+#     - <dataset>.jsonl: one JSON record per line for every dataset. Table rows keep their
+#       typed fields (see data_collectors/records.py), optimization findings are written as
+#       {category, resource} and billing as {service, amount}
+#     - charts.jsonl: one record per chart (title, style, and where its series are)
+#     - series.bin: every chart series as two columns, all timestamps (int64 epoch seconds)
+#       followed by all values (float64), little-endian
+#    The snapshot is written next to its final path and moved into place when complete.
+
+SNAPSHOT_FORMAT = "aws-report-snapshot"
+SNAPSHOT_VERSION = 2
+
+_TIMESTAMP_TYPE = 'q'
+_VALUE_TYPE = 'd'
+
+
+def _write_jsonl(path, records):
+    count = 0
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':'), default=str))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def _read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _records(name, value):
+    if name == 'optimization':
+        return [{'category': category, 'resource': resource}
+                for category, resources in value.items() for resource in resources]
+    if name == 'billing':
+        return [{'service': service, 'amount': amount} for service, amount in value.items()]
+    return (to_record(row) for row in value)
+
+
+def _from_records(name, records):
+    if name == 'optimization':
+        value = {}
+        for record in records:
+            value.setdefault(record['category'], []).append(record['resource'])
+        return value
+    if name == 'billing':
+        return {record['service']: record['amount'] for record in records}
+    return [from_record(ROWS[name], record) for record in records]
+
+
+def _little_endian(column):
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+#Chart records, with line series moved to the timestamp and value columns
+def _chart_records(data, timestamps, values):
+    for name in CHARTS:
+        for chart_name, job in data.get(name, []):
+            record = {'dataset': name, 'name': chart_name, 'key': job.key, 'kind': job.kind,
+                      'title': job.title, 'style': job.style}
+            if job.kind == 'line':
+                record['series'] = []
+                for metric_name, points in job.data.items():
+                    record['series'].append([metric_name, len(timestamps), len(points)])
+                    for ts, value in points:
+                        timestamps.append(int(ts.timestamp()))
+                        values.append(float(value))
+            else:
+                record['data'] = job.data
+            yield record
+
+
+def _chart_from_record(record, timestamps, values):
+    if 'series' in record:
+        data = {}
+        for metric_name, start, count in record['series']:
+            data[metric_name] = [
+                (datetime.fromtimestamp(timestamps[i], tz=timezone.utc), values[i])
+                for i in range(start, start + count)
+            ]
+    else:
+        data = record['data']
+    return record['name'], ChartJob(record['key'], record['kind'], record['title'], data, record['style'])
+
+
+def _write_dataset(temp_path, name, value):
+    file_name = f"{name}.jsonl"
+    return {'file': file_name, 'records': _write_jsonl(os.path.join(temp_path, file_name), _records(name, value))}
+
+
+#Returns the charts and series entries of the manifest
+def _write_charts(temp_path, data):
+    timestamps, values = array(_TIMESTAMP_TYPE), array(_VALUE_TYPE)
+    chart_count = _write_jsonl(os.path.join(temp_path, "charts.jsonl"), _chart_records(data, timestamps, values))
+    with open(os.path.join(temp_path, "series.bin"), 'wb') as f:
+        _little_endian(timestamps).tofile(f)
+        _little_endian(values).tofile(f)
+    return {'file': "charts.jsonl", 'records': chart_count}, {'file': "series.bin", 'points': len(timestamps)}
+
+
+#Collect a dataset into a snapshot directory
+#    Parameters:
+#     - path (str): Snapshot directory (replaced if it exists)
+#     - targets (list): Collected targets, as written by report.dataset.describe_targets
+#     - add_inputs (function): Adds the tasks producing the dataset to the pipeline, given the
+#       pipeline (see report.collect.add_collect_tasks)
+#
+#     Every dataset is written as soon as the task producing it finishes, and the pipeline then
+#     drops it, so the collected rows are not all held until the end of the run. A dataset whose
+#     task failed is written with its default value.
+
+def write_snapshot(path, targets, add_inputs):
+    path = os.path.normpath(path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+
+    pipeline = Pipeline(max_workers=settings.PIPELINE_WORKERS)
+    add_inputs(pipeline)
+    tables = [name for name in DATASET if name not in CHARTS]
+    for name in tables:
+        pipeline.add(f"snapshot:{name}", lambda value, name=name: _write_dataset(temp_path, name, value),
+                     deps=[name])
+    pipeline.add("snapshot:charts", lambda *charts: _write_charts(temp_path, dict(zip(CHARTS, charts))),
+                 deps=CHARTS)
+    results = pipeline.run(keep=[f"snapshot:{name}" for name in tables + ['charts']])
+
+    files = {}
+    for name in tables:
+        files[name] = results.get(f"snapshot:{name}") or _write_dataset(temp_path, name, DATASET[name])
+    charts, series = results.get("snapshot:charts") or _write_charts(temp_path, {})
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'targets': targets,
+        'datasets': files,
+        'charts': charts,
+        'series': series,
+    }
+    with open(os.path.join(temp_path, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(temp_path, path)
+    print(f"Snapshot saved as: {path} ({charts['records']} charts, {series['points']} datapoints)")
+
+
+#Load a snapshot written by write_snapshot
+#    Returns:
+#     - tuple: (targets, dataset name -> value)
+
+def read_snapshot(path):
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a report snapshot")
+    if manifest.get('version', 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {manifest['version']} is newer than this version of the "
+                         f"report supports ({SNAPSHOT_VERSION})")
+    #Version 1 stored table rows as display text
+    if manifest.get('version', 0) < SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {manifest.get('version')} is no longer supported, "
+                         f"collect it again")
+
+    data = dict(DATASET)
+    for name, entry in manifest['datasets'].items():
+        if name in DATASET:
+            data[name] = _from_records(name, _read_jsonl(os.path.join(path, entry['file'])))
+
+    points = manifest['series']['points']
+    timestamps, values = array(_TIMESTAMP_TYPE), array(_VALUE_TYPE)
+    with open(os.path.join(path, manifest['series']['file']), 'rb') as f:
+        timestamps.fromfile(f, points)
+        values.fromfile(f, points)
+    _little_endian(timestamps)
+    _little_endian(values)
+
+    for name in CHARTS:
+        data[name] = []
+    for record in _read_jsonl(os.path.join(path, manifest['charts']['file'])):
+        data[record['dataset']].append(_chart_from_record(record, timestamps, values))
+
+    print(f"Loaded snapshot from {manifest['created']}: {manifest['charts']['records']} charts, "
+          f"{points} datapoints")
+    return manifest['targets'], data
@@ -0,0 +1,115 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+import boto3
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+
+from utils import settings
+from utils.rate_limit import register_client
+
+#Shared boto3 client factory
+#    boto3 clients are thread safe but expensive to build, and each one owns its own HTTPS
+#    connection pool. Every module gets its clients from here so one client per
+#    (service, region, credentials) is reused for the whole run. Every client is also
+#    registered with the shared rate limiter.
+
+_lock = threading.Lock()
+_clients = {}
+_session = None
+
+
+#Account and region that collection currently runs against.
+#    The default target (all fields None) means the default session and its region.
+class Target(NamedTuple):
+    account_id: Optional[str] = None
+    region: Optional[str] = None
+    session: Optional[boto3.Session] = None
+
+    @property
+    def label(self):
+        if self.account_id is None and self.region is None:
+            return "default"
+        return f"{self.account_id or 'current'}/{self.region or 'default'}"
+
+
+_target = contextvars.ContextVar('aws_target', default=Target())
+
+
+#Run a block against a target: clients, sessions and regions in that block all resolve to it
+@contextmanager
+def target_scope(target):
+    token = _target.set(target)
+    try:
+        yield target
+    finally:
+        _target.reset(token)
+
+
+#What per-resource caches are keyed by, so identical resource IDs in two accounts never collide
+def current_scope():
+    target = _target.get()
+    return target.account_id or '', target.region or ''
+
+
+def client_config():
+    return Config(
+        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+        retries={'mode': settings.AWS_RETRY_MODE, 'max_attempts': settings.AWS_MAX_ATTEMPTS},
+    )
+
+
+def get_default_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.Session()
+        return _session
+
+
+#Session of the current target
+def get_session():
+    return _target.get().session or get_default_session()
+
+
+#Region of the current target
+def current_region():
+    return _target.get().region or get_session().region_name
+
+
+#Account of the current target (the caller's account for the default target)
+def current_account_id():
+    return _target.get().account_id or get_client('sts').get_caller_identity()['Account']
+
+
+#Cached client
+#    Parameters:
+#     - service (str): boto3 service name (e.g., 'ec2', 'cloudwatch')
+#     - region (str): Region to use (default: the current target's region)
+#     - session (boto3.Session): Session holding the credentials (default: the current target's session)
+#
+#     Returns:
+#     - botocore client
+
+def get_client(service, region=None, session=None):
+    session = session or get_session()
+    region = region or _target.get().region or session.region_name
+    credentials = session.get_credentials()
+    #Refreshable credentials (assumed roles) get new keys when they renew, and the clients built
+    #on them renew along with them, so they are keyed by the credentials object instead
+    if isinstance(credentials, RefreshableCredentials):
+        identity = id(credentials)
+    else:
+        identity = credentials.get_frozen_credentials().access_key if credentials else None
+
+    key = (service, region, identity)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            #Session.client is not thread safe, so clients are also built under the lock
+            client = session.client(service, region_name=region, config=client_config())
+            register_client(client, scope=(region, identity))
+            _clients[key] = client
+    return client
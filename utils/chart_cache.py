@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import threading
+
+from utils import settings
+
+#On-disk chart cache
+#    Rendered PNGs are stored under the hash of everything that goes into the chart (kind,
+#    title, data, style and the renderers' style version), so an unchanged chart is never drawn
+#    twice. Reading a chart refreshes its modification time; when the cache grows past
+#    CHART_CACHE_MAX_MB the least recently used charts are deleted.
+
+#Part of every chart cache key: bump it whenever a renderer's output changes (see utils/plots.py)
+CHART_STYLE_VERSION = 1
+
+_evict_lock = threading.Lock()
+
+
+def cache_dir():
+    return os.path.join(settings.CACHE_DIR, 'charts')
+
+
+def enabled():
+    return settings.CHART_CACHE_ENABLED
+
+
+def chart_hash(job):
+    content = json.dumps([CHART_STYLE_VERSION, job.kind, job.title, job.data, job.style],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _path(digest):
+    return os.path.join(cache_dir(), digest[:2], f"{digest}.png")
+
+
+#PNG bytes for a chart hash, or None when it is not cached
+def load(digest):
+    if settings.REFRESH_CACHE:
+        return None
+    path = _path(digest)
+    try:
+        with open(path, 'rb') as f:
+            png = f.read()
+        os.utime(path)
+        return png
+    except OSError:
+        return None
+
+
+def save(digest, png):
+    path = _path(digest)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        #Written to a temporary file first so a concurrent run never reads half a chart
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(png)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not cache chart: {e}")
+
+
+#Delete least recently used charts until the cache fits in max_mb
+def evict(max_mb=None):
+    limit = (max_mb if max_mb is not None else settings.CHART_CACHE_MAX_MB) * 1024 * 1024
+    with _evict_lock:
+        entries = []
+        for root, _, files in os.walk(cache_dir()):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
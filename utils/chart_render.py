@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple, Optional
+
+from utils import chart_cache, settings
+
+#Chart rendering stage
+#    Matplotlib drawing is CPU bound and holds the GIL, so charts are drawn in a pool of worker
+#    processes (one per core by default) and come back as PNG bytes. A chart that fails is
+#    reported and left out without affecting the others. Charts are drawn in this process,
+#    one at a time, when the pool is disabled (CHART_WORKERS=1), cannot be started, or breaks.
+#    Charts that were rendered before with the same input come from the chart cache.
+#    Chart kinds set to the 'native' backend (CHART_BACKENDS) are not rendered at all; they
+#    are drawn as PowerPoint charts when placed on the slide (see utils/native_charts.py).
+
+
+class ChartJob(NamedTuple):
+    key: str  # identifies the chart in the results
+    kind: str  # a key of plots.RENDERERS
+    title: str
+    data: dict
+    style: Optional[dict] = None
+
+
+def render_chart(job):
+    #Matplotlib is only imported once an image chart is drawn
+    from utils.plots import RENDERERS
+    return RENDERERS[job.kind](job.title, job.data, job.style or {})
+
+
+def is_native(job):
+    return settings.CHART_BACKENDS.get(job.kind, 'image') == 'native'
+
+
+_pool = None
+_pool_lock = threading.Lock()
+#Matplotlib is not thread safe, so in-process rendering is serialized
+_serial_lock = threading.Lock()
+
+
+def worker_count():
+    return settings.CHART_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None and worker_count() > 1:
+            try:
+                #Workers are not forked from this (multi-threaded) process by default
+                context = multiprocessing.get_context(settings.CHART_START_METHOD)
+                _pool = ProcessPoolExecutor(max_workers=worker_count(), mp_context=context)
+            except (OSError, ValueError) as e:
+                print(f"Could not start chart workers ({e}), rendering charts in-process")
+                settings.CHART_WORKERS = 1
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        #Do not keep restarting a pool that breaks
+        settings.CHART_WORKERS = 1
+
+
+def shutdown_workers():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+
+def _render_in_process(job):
+    try:
+        with _serial_lock:
+            return render_chart(job)
+    except Exception as e:
+        print(f"Error rendering chart '{job.key}': {e}")
+        return None
+
+
+def _render_all(jobs):
+    #A single chart is not worth a round trip to a worker
+    pool = _get_pool() if len(jobs) > 1 else None
+
+    futures = {}
+    if pool is not None:
+        try:
+            futures = {job.key: pool.submit(render_chart, job) for job in jobs}
+        except (BrokenProcessPool, RuntimeError) as e:
+            print(f"Chart workers unavailable ({e}), rendering charts in-process")
+            _discard_pool()
+            futures = {}
+
+    charts = {}
+    for job in jobs:
+        future = futures.get(job.key)
+        if future is None:
+            png = _render_in_process(job)
+        else:
+            try:
+                png = future.result()
+            except BrokenProcessPool as e:
+                print(f"Chart workers stopped ({e}), rendering the remaining charts in-process")
+                _discard_pool()
+                futures = {}
+                png = _render_in_process(job)
+            except Exception as e:
+                print(f"Error rendering chart '{job.key}': {e}")
+                png = None
+        if png is not None:
+            charts[job.key] = png
+    return charts
+
+
+#Render charts
+#    Charts found in the chart cache are not drawn again.
+#
+#    Parameters:
+#     - jobs (list): ChartJob per chart
+#
+#     Returns:
+#     - dict: job key -> PNG bytes, for the charts that rendered
+
+def render_charts(jobs):
+    if not chart_cache.enabled():
+        return _render_all(jobs)
+
+    charts = {}
+    digests = {}
+    for job in jobs:
+        digests[job.key] = chart_cache.chart_hash(job)
+        png = chart_cache.load(digests[job.key])
+        if png is not None:
+            charts[job.key] = png
+
+    missing = [job for job in jobs if job.key not in charts]
+    if len(jobs) > 1:
+        print(f"Reusing {len(charts)} cached charts, rendering {len(missing)}")
+    if missing:
+        rendered = _render_all(missing)
+        for key, png in rendered.items():
+            chart_cache.save(digests[key], png)
+        charts.update(rendered)
+        chart_cache.evict()
+    return charts
+
+
+#Charts ready to place on slides
+#    Returns:
+#     - dict: job key -> PNG bytes for image charts, None for native charts; charts that
+#       failed to render are left out
+
+def prepare_charts(jobs):
+    rendered = render_charts([job for job in jobs if not is_native(job)])
+    return {job.key: rendered.get(job.key) for job in jobs if is_native(job) or job.key in rendered}
@@ -1,48 +1,81 @@
+from data_collectors.records import ERROR, NOT_AVAILABLE
+from utils.aws_clients import get_client
 
-import boto3
-from datetime import datetime, timedelta, timezone
+#GetMetricData accepts at most 500 queries per request
+MAX_QUERIES_PER_REQUEST = 500
 
 
-#CloudWatch metric
+#Batched CloudWatch read
 #    Parameters:
-#     - instance_id (str): ID of the instance or resource (e.g., EC2, RDS)
-#     - metric_name (str): Name of the CloudWatch metric
-#     - namespace (str): Namespace of the metric (default: 'CWAgent')
+#     - series (list): (resource_id, metric_name, namespace, dimension_name) tuples to fetch
+#     - start (datetime): Start of the window
+#     - end (datetime): End of the window
+#     - period (int): Datapoint period in seconds
 #     - stat (str): Statistic to retrieve (e.g., 'Average', 'Maximum')
-#     - dimension_name (str): Dimension key to use (default: 'InstanceId')
 #
 #     Returns:
-#     - float or str: The metric value or "N/A"/"Error"
+#     - dict: series tuple -> list of (timestamp, value) sorted by time, or None if the request failed
 
-def get_cloudwatch_metric(instance_id, metric_name, namespace='CWAgent', stat='Average', dimension_name='InstanceId'):
+def get_metric_data_batch(series, start, end, period, stat='Average'):
+    series = list(dict.fromkeys(series))
+    results = {}
+    if not series:
+        return results
 
     try:
-        session = boto3.Session()
-        cloudwatch = session.client('cloudwatch')
-
-        now = datetime.now(timezone.utc)
-        print(f"Fetching {metric_name} for {instance_id} from namespace {namespace}")
-
-        response = cloudwatch.get_metric_statistics(
-            Namespace=namespace,
-            MetricName=metric_name,
-            Dimensions=[{'Name': dimension_name, 'Value': instance_id}],
-            StartTime=now - timedelta(hours=24),
-            EndTime=now,
-            Period=3600,
-            Statistics=[stat]
-        )
-
-        datapoints = response.get('Datapoints', [])
-        if datapoints:
-            datapoints.sort(key=lambda x: x['Timestamp'], reverse=True)
-            value = round(datapoints[0][stat], 2)
-            print(f"Got {metric_name}: {value}")
-            return value
-        else:
-            print(f"No datapoints found for {metric_name}")
-            return "N/A"
-
+        cloudwatch = get_client('cloudwatch')
+        paginator = cloudwatch.get_paginator('get_metric_data')
     except Exception as e:
-        print(f"Error fetching {metric_name} for {instance_id}: {str(e)}")
-        return "Error"
+        print(f"Error creating CloudWatch client: {str(e)}")
+        return {key: None for key in series}
+
+    for offset in range(0, len(series), MAX_QUERIES_PER_REQUEST):
+        chunk = series[offset:offset + MAX_QUERIES_PER_REQUEST]
+        query_ids = {}
+        queries = []
+        for index, (resource_id, metric_name, namespace, dimension_name) in enumerate(chunk):
+            query_id = f"q{index}"
+            query_ids[query_id] = chunk[index]
+            queries.append({
+                'Id': query_id,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': namespace,
+                        'MetricName': metric_name,
+                        'Dimensions': [{'Name': dimension_name, 'Value': resource_id}],
+                    },
+                    'Period': period,
+                    'Stat': stat,
+                },
+                'ReturnData': True,
+            })
+
+        print(f"Fetching {len(queries)} metric series with GetMetricData")
+        chunk_results = {key: [] for key in chunk}
+        try:
+            #The paginator follows NextToken until every series is complete
+            for page in paginator.paginate(MetricDataQueries=queries, StartTime=start, EndTime=end,
+                                           ScanBy='TimestampAscending'):
+                for result in page.get('MetricDataResults', []):
+                    key = query_ids[result['Id']]
+                    if result.get('StatusCode') in ('InternalError', 'Forbidden'):
+                        chunk_results[key] = None
+                    elif chunk_results[key] is not None:
+                        chunk_results[key].extend(zip(result['Timestamps'], result['Values']))
+        except Exception as e:
+            print(f"Error fetching metric batch: {str(e)}")
+            chunk_results = {key: None for key in chunk}
+
+        for key, datapoints in chunk_results.items():
+            results[key] = sorted(datapoints) if datapoints is not None else None
+
+    return results
+
+
+#Most recent datapoint of a series as a report value (ERROR if the fetch failed, NOT_AVAILABLE if empty)
+def latest_value(datapoints):
+    if datapoints is None:
+        return ERROR
+    if not datapoints:
+        return NOT_AVAILABLE
+    return round(datapoints[-1][1], 2)
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from utils import settings
+from utils.aws_clients import get_client
+
+#Local daily cost history
+#    Cost Explorer is billed per request, so daily unblended cost per service is kept in SQLite
+#    and month-to-date / month-over-month totals are summed locally. Each sync only requests
+#    the days since the previous sync, going back COST_RESTATEMENT_DAYS more because Cost
+#    Explorer keeps revising recent (estimated) days. A second sync on the same day makes no
+#    Cost Explorer call at all.
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_costs (
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    service TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (account, day, service)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    account TEXT PRIMARY KEY,
+    synced_on TEXT NOT NULL,
+    history_start TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_connection = None
+_lock = threading.Lock()
+
+
+def history_path():
+    if not settings.COST_CACHE_ENABLED:
+        return ':memory:'
+    return os.path.join(settings.CACHE_DIR, 'costs.sqlite')
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        path = history_path()
+        if path != ':memory:':
+            os.makedirs(settings.CACHE_DIR, exist_ok=True)
+        _connection = sqlite3.connect(path, check_same_thread=False)
+        if _connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            _connection.executescript("DROP TABLE IF EXISTS daily_costs; DROP TABLE IF EXISTS sync_state;")
+            _connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+
+#First day of the month before `day`: the oldest day month-over-month needs
+def history_start(day):
+    return (day.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+#Daily cost per service from Cost Explorer (every page)
+#    Returns:
+#     - list: (day 'YYYY-MM-DD', service, amount) for start <= day < end
+
+def _fetch_daily(start, end):
+    client = get_client('ce')
+    request = {
+        'TimePeriod': {'Start': start.isoformat(), 'End': end.isoformat()},
+        'Granularity': 'DAILY',
+        'Metrics': ['UnblendedCost'],
+        'GroupBy': [{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
+    }
+    rows = []
+    while True:
+        response = client.get_cost_and_usage(**request)
+        for result in response['ResultsByTime']:
+            day = result['TimePeriod']['Start']
+            for group in result.get('Groups', []):
+                rows.append((day, group['Keys'][0], float(group['Metrics']['UnblendedCost']['Amount'])))
+        token = response.get('NextPageToken')
+        if not token:
+            return rows
+        request['NextPageToken'] = token
+
+
+#Bring an account's history up to date
+#    Parameters:
+#     - account (str): Account the costs belong to
+#     - today (date): Current UTC day (default: today)
+#
+#     Returns:
+#     - int: Number of Cost Explorer days requested (0 when the history was already current)
+
+def sync(account, today=None):
+    today = today or date.today()
+    start = history_start(today)
+
+    with _lock:
+        connection = _connect()
+        state = connection.execute("SELECT synced_on, history_start FROM sync_state WHERE account=?",
+                                   (account,)).fetchone()
+        complete = state is not None and date.fromisoformat(state[1]) <= start and not settings.REFRESH_CACHE
+        if complete and state[0] == today.isoformat():
+            return 0
+
+        if complete:
+            fetch_from = max(start, date.fromisoformat(state[0]) - timedelta(days=settings.COST_RESTATEMENT_DAYS))
+        else:
+            fetch_from = start
+
+    #Today is included (End is exclusive) and is restated by the next sync
+    print(f"Fetching daily costs from {fetch_from} to {today} from Cost Explorer")
+    rows = _fetch_daily(fetch_from, today + timedelta(days=1))
+
+    with _lock:
+        connection = _connect()
+        with connection:
+            #Restated days replace what was stored, including services that dropped to zero
+            connection.execute("DELETE FROM daily_costs WHERE account=? AND day>=?", (account, fetch_from.isoformat()))
+            connection.executemany("INSERT OR REPLACE INTO daily_costs VALUES (?, ?, ?, ?)",
+                                   [(account, day, service, amount) for day, service, amount in rows])
+            #The history is complete from start on, so eviction never goes past it
+            connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                               (account, today.isoformat(), start.isoformat()))
+            cutoff = min(start, today - timedelta(days=settings.COST_HISTORY_RETENTION_DAYS))
+            connection.execute("DELETE FROM daily_costs WHERE day<?", (cutoff.isoformat(),))
+    return (today - fetch_from).days + 1
+
+
+#Cost per service over start <= day < end, from the local history
+def get_costs(account, start, end):
+    with _lock:
+        rows = _connect().execute(
+            "SELECT service, SUM(amount) FROM daily_costs WHERE account=? AND day>=? AND day<? GROUP BY service",
+            (account, start.isoformat(), end.isoformat())).fetchall()
+    return dict(rows)
@@ -0,0 +1,69 @@
+import boto3
+import botocore.session
+from botocore.credentials import AssumeRoleCredentialFetcher, DeferredRefreshableCredentials
+
+from utils import settings
+from utils.aws_clients import Target, get_client, get_default_session, target_scope
+
+
+#Session for another account, through sts:AssumeRole from the default credentials
+#    The role is assumed on the session's first call, and assumed again shortly before the
+#    credentials expire, so a run longer than the role's session duration keeps working.
+def assume_role_session(account_id, role_name):
+    default_session = get_default_session()
+    fetcher = AssumeRoleCredentialFetcher(
+        client_creator=lambda service, **kwargs: get_client(service, session=default_session),
+        source_credentials=default_session.get_credentials(),
+        role_arn=f"arn:aws:iam::{account_id}:role/{role_name}",
+        extra_args={'RoleSessionName': "aws-report-generator"},
+    )
+    session = botocore.session.Session()
+    session._credentials = DeferredRefreshableCredentials(
+        refresh_using=fetcher.fetch_credentials, method='assume-role')
+    return boto3.Session(botocore_session=session, region_name=default_session.region_name)
+
+
+#Collection targets
+#    Parameters:
+#     - accounts (list): Account IDs to assume a role in (default: only the current account)
+#     - regions (list): Regions to collect (default: only the session region)
+#     - role_name (str): Role to assume in every listed account
+#
+#     Returns:
+#     - list of Target, one per (account, region); [Target()] when neither is given
+
+def build_targets(accounts=None, regions=None, role_name=None):
+    if not accounts and not regions:
+        return [Target()]
+
+    default_session = get_default_session()
+    regions = regions or [default_session.region_name]
+
+    if not accounts:
+        account_id = get_client('sts', session=default_session).get_caller_identity()['Account']
+        return [Target(account_id, region, default_session) for region in regions]
+
+    if not role_name:
+        raise ValueError("A role name is required to collect from other accounts")
+
+    targets = []
+    for account_id in accounts:
+        print(f"Collecting account {account_id} through {role_name}")
+        session = assume_role_session(account_id, role_name)
+        targets.extend(Target(account_id, region, session) for region in regions)
+    return targets
+
+
+#Pipeline lane of a target's account, limited to FANOUT_MAX_PER_ACCOUNT tasks at once
+def account_lane(pipeline, target):
+    lane = f"account:{target.account_id or 'current'}"
+    pipeline.set_lane_limit(lane, settings.FANOUT_MAX_PER_ACCOUNT)
+    return lane
+
+
+#Wrap a task so it runs against a target
+def in_target(target, func):
+    def run(*args):
+        with target_scope(target):
+            return func(*args)
+    return run
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from utils import settings
+from utils.aws_clients import current_scope
+
+#Persistent CloudWatch datapoint cache
+#    Datapoints are stored per (scope, namespace, metric, dimension, resource, period, stat), where
+#    scope is the account and region they were collected from, together
+#    with the time range the cache holds every datapoint of (fetched_from to fetched_until), so
+#    later runs only request the missing tail when the cached range covers the rest of their window.
+#    Entries older than METRIC_CACHE_RETENTION_DAYS are evicted when the cache is opened.
+
+#Bumped whenever the tables change; older caches are dropped and rebuilt
+SCHEMA_VERSION = 3
+
+#Longest window the report reads (metric_store.MONTH) and the period its start is aligned to,
+#in days: retention never goes below it, or every run would backfill the evicted start again
+MIN_RETENTION_DAYS = 31
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datapoints (
+    scope TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    stat TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (scope, namespace, metric, dimension, resource, period, stat, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    scope TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    stat TEXT NOT NULL,
+    fetched_from INTEGER NOT NULL,
+    fetched_until INTEGER NOT NULL,
+    PRIMARY KEY (scope, namespace, metric, dimension, resource, period, stat)
+) WITHOUT ROWID;
+"""
+
+#Matches every column of _series_key
+_SERIES_MATCH = "scope=? AND namespace=? AND metric=? AND dimension=? AND resource=? AND period=? AND stat=?"
+
+_connection = None
+_lock = threading.Lock()
+
+
+def cache_path():
+    return os.path.join(settings.CACHE_DIR, 'metrics.sqlite')
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        os.makedirs(settings.CACHE_DIR, exist_ok=True)
+        _connection = sqlite3.connect(cache_path(), check_same_thread=False)
+        if _connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            _connection.executescript("DROP TABLE IF EXISTS datapoints; DROP TABLE IF EXISTS series;")
+            _connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        _connection.executescript(_SCHEMA)
+        _evict(_connection, settings.METRIC_CACHE_RETENTION_DAYS)
+    return _connection
+
+
+def _series_key(series, period, stat):
+    resource_id, metric_name, namespace, dimension_name = series
+    return '/'.join(current_scope()), namespace, metric_name, dimension_name, resource_id, period, stat
+
+
+def _epoch(timestamp):
+    return int(timestamp.timestamp())
+
+
+def _datetime(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def enabled():
+    return settings.METRIC_CACHE_ENABLED
+
+
+#Load cached series
+#    Parameters:
+#     - series (list): (resource_id, metric_name, namespace, dimension_name) tuples
+#     - period (int): Datapoint period in seconds
+#     - stat (str): Statistic
+#     - since (datetime): Oldest datapoint to return
+#
+#     Returns:
+#     - dict: series tuple -> (fetched_from datetime, fetched_until datetime, [(timestamp, value), ...])
+#       for cached series only
+
+def load(series, period, stat, since):
+    if settings.REFRESH_CACHE:
+        return {}
+
+    cached = {}
+    with _lock:
+        connection = _connect()
+        for key in series:
+            params = _series_key(key, period, stat)
+            row = connection.execute(f"SELECT fetched_from, fetched_until FROM series WHERE {_SERIES_MATCH}",
+                                     params).fetchone()
+            if row is None:
+                continue
+            rows = connection.execute(
+                f"SELECT ts, value FROM datapoints WHERE {_SERIES_MATCH} AND ts>=? ORDER BY ts",
+                params + (_epoch(since),)).fetchall()
+            cached[key] = (_datetime(row[0]), _datetime(row[1]), [(_datetime(ts), value) for ts, value in rows])
+    return cached
+
+
+#Merge freshly fetched datapoints into the cache
+#    Parameters:
+#     - series (tuple): (resource_id, metric_name, namespace, dimension_name)
+#     - period (int): Datapoint period in seconds
+#     - stat (str): Statistic
+#     - datapoints (list): (timestamp, value) pairs; newer values replace cached ones
+#     - fetched_from (datetime): Start of the window that was fetched
+#     - fetched_until (datetime): End of the window that was fetched
+#
+#     The fetched window extends the cached range when the two overlap; otherwise it replaces it.
+
+def save(series, period, stat, datapoints, fetched_from, fetched_until):
+    params = _series_key(series, period, stat)
+    start, end = _epoch(fetched_from), _epoch(fetched_until)
+    with _lock:
+        connection = _connect()
+        with connection:
+            row = connection.execute(f"SELECT fetched_from, fetched_until FROM series WHERE {_SERIES_MATCH}",
+                                     params).fetchone()
+            if settings.REFRESH_CACHE or row is None or not (start <= row[1] and row[0] <= end):
+                connection.execute(f"DELETE FROM datapoints WHERE {_SERIES_MATCH}", params)
+            else:
+                start, end = min(start, row[0]), max(end, row[1])
+            connection.executemany(
+                "INSERT OR REPLACE INTO datapoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [params + (_epoch(timestamp), value) for timestamp, value in datapoints])
+            connection.execute("INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               params + (start, end))
+
+
+#Drop datapoints older than the retention period
+#    Series with nothing left are dropped too; the others now only cover the range from the cutoff.
+def _evict(connection, retention_days):
+    retention_days = max(retention_days, MIN_RETENTION_DAYS)
+    cutoff = int(datetime.now(timezone.utc).timestamp()) - retention_days * 86400
+    with connection:
+        connection.execute("DELETE FROM datapoints WHERE ts<?", (cutoff,))
+        connection.execute("DELETE FROM series WHERE fetched_until<?", (cutoff,))
+        connection.execute("UPDATE series SET fetched_from=? WHERE fetched_from<?", (cutoff, cutoff))
@@ -0,0 +1,156 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from utils import metric_cache
+from utils.aws_clients import current_scope
+from utils.cloudwatch import get_metric_data_batch, latest_value
+
+HOUR = 3600
+DAY = 86400
+MONTH = 30 * DAY
+
+#How a wider period is rebuilt from narrower datapoints, per statistic
+_RESAMPLE = {
+    'Average': lambda values: sum(values) / len(values),
+    'Sum': sum,
+    'SampleCount': sum,
+    'Maximum': max,
+    'Minimum': min,
+}
+
+#Per-run metric store
+#    Every series fetched during a run is kept here, keyed by the current account and region plus
+#    (namespace, metric_name, dimension_name, resource_id, stat), and then by (window, period).
+#    A request is answered by any stored entry whose window covers it and whose period divides
+#    the requested period, so one 30-day hourly fetch serves both the 24h table values and the
+#    30-day daily graphs.
+_entries = {}
+_lock = threading.Lock()
+
+
+def _base_key(series, stat):
+    resource_id, metric_name, namespace, dimension_name = series
+    return current_scope(), namespace, metric_name, dimension_name, resource_id, stat
+
+
+def _align(timestamp, period):
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % period, tz=timezone.utc)
+
+
+def _resample(datapoints, origin, period, stat):
+    buckets = {}
+    for timestamp, value in datapoints:
+        bucket = int((timestamp - origin).total_seconds() // period)
+        buckets.setdefault(bucket, []).append(value)
+    aggregate = _RESAMPLE[stat]
+    return [(origin + timedelta(seconds=bucket * period), aggregate(values))
+            for bucket, values in sorted(buckets.items())]
+
+
+def _lookup(series, window, period, stat):
+    #Returns (True, datapoints) when the store can answer, (False, None) otherwise
+    candidates = _entries.get(_base_key(series, stat), {})
+    for (stored_window, stored_period), (end, datapoints) in candidates.items():
+        if stored_window < window or period % stored_period:
+            continue
+        if stored_period != period and stat not in _RESAMPLE:
+            continue
+        if datapoints is None:
+            return True, None
+
+        origin = _align(end - timedelta(seconds=window), period)
+        selected = [(timestamp, value) for timestamp, value in datapoints if timestamp >= origin]
+        if stored_period != period:
+            selected = _resample(selected, origin, period, stat)
+        return True, selected
+    return False, None
+
+
+#Fetch into the store
+#    Parameters:
+#     - series (list): (resource_id, metric_name, namespace, dimension_name) tuples
+#     - window (int): Length of the window in seconds, ending now
+#     - period (int): Datapoint period in seconds
+#     - stat (str): Statistic to retrieve
+#
+#     Only series the store cannot already answer are requested from CloudWatch.
+
+def prefetch(series, window, period, stat='Average'):
+    with _lock:
+        missing = [key for key in dict.fromkeys(series) if not _lookup(key, window, period, stat)[0]]
+    if not missing:
+        return
+
+    end = datetime.now(timezone.utc)
+    start = _align(end - timedelta(seconds=window), period)
+    cached = metric_cache.load(missing, period, stat, start) if metric_cache.enabled() else {}
+
+    #Series on disk from the start of the window only need the tail since their last fetch. The
+    #last cached bucket is requested again because it may have been incomplete at that time.
+    #Series whose cached range starts later (a shorter window, or evicted datapoints) are
+    #fetched for the whole window.
+    fetch_groups = {}
+    for key in missing:
+        fetch_from = start
+        if key in cached:
+            cached_from, cached_until, _ = cached[key]
+            if cached_from <= start:
+                fetch_from = max(start, _align(cached_until, period) - timedelta(seconds=period))
+            else:
+                del cached[key]
+        fetch_groups.setdefault(fetch_from, []).append(key)
+
+    for fetch_from, keys in fetch_groups.items():
+        batch = get_metric_data_batch(keys, fetch_from, end, period, stat)
+        for key, fresh in batch.items():
+            #A failed refresh marks the series as failed: the cached points alone would pass an
+            #old reading off as the current one
+            datapoints = None
+            if fresh is not None:
+                _, _, datapoints = cached.get(key, (None, None, None))
+                merged = dict(datapoints or [])
+                merged.update(fresh)
+                datapoints = sorted(merged.items())
+                if metric_cache.enabled():
+                    metric_cache.save(key, period, stat, fresh, fetch_from, end)
+            with _lock:
+                _entries.setdefault(_base_key(key, stat), {})[(window, period)] = (end, datapoints)
+
+
+#Read from the store
+#    Parameters:
+#     - series (list): (resource_id, metric_name, namespace, dimension_name) tuples
+#     - window (int): Length of the window in seconds, ending now
+#     - period (int): Datapoint period in seconds
+#     - stat (str): Statistic to retrieve
+#
+#     Returns:
+#     - dict: series tuple -> list of (timestamp, value) sorted by time, or None if the fetch failed
+
+def get_series(series, window, period, stat='Average'):
+    prefetch(series, window, period, stat)
+    with _lock:
+        return {key: _lookup(key, window, period, stat)[1] for key in series}
+
+
+#Latest value of the last 24h for many series at once
+#    Parameters:
+#     - series (list): (resource_id, metric_name, namespace, dimension_name) tuples
+#     - stat (str): Statistic to retrieve
+#
+#     Returns:
+#     - dict: series tuple -> float, or NOT_AVAILABLE/ERROR (see data_collectors/records.py)
+
+def get_latest_values(series, stat='Average'):
+    return {key: latest_value(datapoints) for key, datapoints in get_series(series, DAY, HOUR, stat).items()}
+
+
+#Drop series from the store
+#    Called once nothing in the run reads them again (the graph series have been read), so the
+#    store does not hold every 30-day hourly series until the report is saved.
+
+def release(series, stat='Average'):
+    with _lock:
+        for key in series:
+            _entries.pop(_base_key(key, stat), None)
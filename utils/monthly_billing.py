@@ -1,24 +1,54 @@
-import boto3
-from datetime import datetime, timedelta
+from utils import cost_history
+from utils.aws_clients import current_account_id
+from datetime import datetime, timedelta, timezone
 
+
+def _today():
+    #Cost Explorer days are UTC days
+    return datetime.now(timezone.utc).date()
+
+
+#Month-to-date cost per service, from the local daily cost history
 def get_monthly_billing_data():
-    client = boto3.client('ce')
-    today = datetime.today()
-    start = today.replace(day=1).strftime('%Y-%m-%d')
-    end = (today.replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d')
-
-    response = client.get_cost_and_usage(
-        TimePeriod={'Start': start, 'End': end},
-        Granularity='MONTHLY',
-        Metrics=['UnblendedCost'],
-        GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}]
-    )
+    account_id = current_account_id()
+    today = _today()
+    cost_history.sync(account_id, today)
+
+    month_start = today.replace(day=1)
+    costs = cost_history.get_costs(account_id, month_start, today + timedelta(days=1))
 
     billing_data = {}
-    for group in response['ResultsByTime'][0]['Groups']:
-        service = group['Keys'][0]
-        amount = float(group['Metrics']['UnblendedCost']['Amount'])
+    for service, amount in costs.items():
         if amount > 0:
             billing_data[service] = amount
 
+    comparison = _month_over_month(account_id, today)
+    print(f"Month to date: ${comparison['month_to_date']:,.2f} "
+          f"(same days last month: ${comparison['previous_month_to_date']:,.2f})")
     return billing_data
+
+
+#Month-over-month totals
+#    Compares month-to-date cost with the same days of the previous month, from a cost history
+#    already synced up to today.
+#
+#     Returns:
+#     - dict: month_to_date, previous_month_to_date, previous_month (totals) and change_percent
+#       (None when the previous period cost nothing)
+
+def _month_over_month(account_id, today):
+    month_start = today.replace(day=1)
+    previous_start = cost_history.history_start(today)
+    #Same number of days into the previous month, capped at its last day
+    previous_until = min(previous_start + (today - month_start) + timedelta(days=1), month_start)
+
+    month_to_date = sum(cost_history.get_costs(account_id, month_start, today + timedelta(days=1)).values())
+    previous_to_date = sum(cost_history.get_costs(account_id, previous_start, previous_until).values())
+    previous_month = sum(cost_history.get_costs(account_id, previous_start, month_start).values())
+
+    return {
+        'month_to_date': month_to_date,
+        'previous_month_to_date': previous_to_date,
+        'previous_month': previous_month,
+        'change_percent': (month_to_date - previous_to_date) / previous_to_date * 100 if previous_to_date else None,
+    }
@@ -1,28 +1,29 @@
-import boto3
-from datetime import datetime, timedelta, timezone
+from utils.metric_store import DAY, MONTH, get_series
 
-def get_monthly_metrics(resource_id, metric_names, namespace, dimension_name):
-    cloudwatch = boto3.client('cloudwatch')
-    now = datetime.now(timezone.utc)
-    start = now - timedelta(days=30)
-    metrics_data = {}
 
-    for metric in metric_names:
-        try:
-            response = cloudwatch.get_metric_statistics(
-                Namespace=namespace,
-                MetricName=metric,
-                Dimensions=[{'Name': dimension_name, 'Value': resource_id}],
-                StartTime=start,
-                EndTime=now,
-                Period=86400,  # Daily datapoints
-                Statistics=['Average']
-            )
-            datapoints = response['Datapoints']
+#Monthly series for many resources at once
+#    Parameters:
+#     - requests (list): (resource_id, metric_names, namespace, dimension_name) tuples
+#
+#     Returns:
+#     - dict: (resource_id, namespace) -> {metric: [(timestamp, value), ...]} or None if any metric is missing
+
+def get_monthly_metrics_batch(requests):
+    series = [
+        (resource_id, metric, namespace, dimension_name)
+        for resource_id, metric_names, namespace, dimension_name in requests
+        for metric in metric_names
+    ]
+    batch = get_series(series, MONTH, DAY)  # Daily datapoints
+
+    monthly = {}
+    for resource_id, metric_names, namespace, dimension_name in requests:
+        metrics_data = {}
+        for metric in metric_names:
+            datapoints = batch.get((resource_id, metric, namespace, dimension_name))
             if not datapoints:
-                return None  # Skip if any metric is missing
-            sorted_data = sorted([(dp['Timestamp'], dp['Average']) for dp in datapoints])
-            metrics_data[metric] = sorted_data
-        except Exception:
-            return None
-    return metrics_data
+                metrics_data = None  # Skip if any metric is missing
+                break
+            metrics_data[metric] = datapoints
+        monthly[(resource_id, namespace)] = metrics_data
+    return monthly
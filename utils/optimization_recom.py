@@ -1,10 +1,87 @@
-import boto3
+import json
+import os
+import time
 
-def get_aws_optimization_status():
-    client = boto3.client("compute-optimizer")
+from utils import settings
+from utils.aws_clients import current_account_id, current_region, get_client
+
+#Compute Optimizer recommendations
+#    AWS refreshes recommendations about once a day, so the full payloads (finding, options,
+#    savings estimates) are kept in a JSON file per account and region and reused for
+#    OPTIMIZATION_CACHE_TTL_HOURS.
+
+RECOMMENDATION_SOURCES = {
+    'ec2': ('get_ec2_instance_recommendations', 'instanceRecommendations'),
+    'rds': ('get_rds_database_recommendations', 'rdsDBRecommendations'),
+}
+
+
+def _cache_file():
+    return os.path.join(settings.CACHE_DIR, 'compute_optimizer', f"{current_account_id()}_{current_region()}.json")
+
+
+#Every page of one recommendation listing (these operations have no boto3 paginator)
+def _fetch_all(client, operation, result_key):
+    recommendations = []
+    request = {}
+    while True:
+        response = getattr(client, operation)(**request)
+        recommendations.extend(response.get(result_key, []))
+        token = response.get('nextToken')
+        if not token:
+            return recommendations
+        request['nextToken'] = token
+
+
+def _load_cached(path):
+    if settings.REFRESH_CACHE or settings.OPTIMIZATION_CACHE_TTL_HOURS <= 0:
+        return None
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached['fetched_at'] > settings.OPTIMIZATION_CACHE_TTL_HOURS * 3600:
+        return None
+    return cached['recommendations']
 
-    ec2_response = client.get_ec2_instance_recommendations()
-    rds_response = client.get_database_recommendations()
+
+def _save_cached(path, recommendations):
+    if settings.OPTIMIZATION_CACHE_TTL_HOURS <= 0:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    #Written to a temporary file first so a concurrent run never reads half a file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'fetched_at': time.time(), 'recommendations': recommendations}, f)
+    os.replace(temp_path, path)
+
+
+#Full recommendation payloads
+#    Returns:
+#     - dict: 'ec2' -> instance recommendations, 'rds' -> database recommendations, as returned
+#       by Compute Optimizer (timestamps as ISO strings)
+
+def get_optimization_recommendations():
+    path = _cache_file()
+    recommendations = _load_cached(path)
+    if recommendations is not None:
+        print(f"Using cached Compute Optimizer recommendations from {path}")
+        return recommendations
+
+    client = get_client("compute-optimizer")
+    recommendations = {
+        source: _fetch_all(client, operation, result_key)
+        for source, (operation, result_key) in RECOMMENDATION_SOURCES.items()
+    }
+    #Round trip through JSON so fresh and cached payloads look the same
+    recommendations = json.loads(json.dumps(recommendations, default=str))
+    _save_cached(path, recommendations)
+    return recommendations
+
+
+def get_aws_optimization_status():
+    recommendations = get_optimization_recommendations()
 
     categorized = {
         "Optimized": [],
@@ -13,14 +90,14 @@ def get_aws_optimization_status():
         "No Recommendation": []
     }
 
-    for instance in ec2_response.get("instanceRecommendations", []):
+    for instance in recommendations['ec2']:
         name = instance["instanceArn"].split("/")[-1]
         status = instance["finding"]
         categorized[_map_finding(status)].append(name)
 
-    for db in rds_response.get("recommendations", []):
-        name = db["databaseArn"].split("/")[-1]
-        status = db["finding"]
+    for db in recommendations['rds']:
+        name = db["resourceArn"].split(":")[-1]
+        status = db["instanceFinding"]
         categorized[_map_finding(status)].append(name)
 
     return categorized
@@ -29,6 +106,10 @@ def _map_finding(finding):
     mapping = {
         "OVER_PROVISIONED": "Over Provisioned",
         "UNDER_PROVISIONED": "Under Provisioned",
-        "OPTIMIZED": "Optimized"
+        "OPTIMIZED": "Optimized",
+        #Spelling used by the current API model (EC2 and RDS)
+        "Overprovisioned": "Over Provisioned",
+        "Underprovisioned": "Under Provisioned",
+        "Optimized": "Optimized",
     }
     return mapping.get(finding, "No Recommendation")
@@ -0,0 +1,207 @@
+import hashlib
+import io
+import math
+import zipfile
+import zlib
+
+from PIL import Image
+from pptx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from pptx.parts.image import ImagePart
+from pptx.util import Emu
+
+from utils import settings
+from utils.template_index import walk_shapes
+
+#Saving the report
+#    A packaging stage between the finished presentation and the .pptx file:
+#     - identical images are stored once, every picture pointing to the same media part
+#     - charts drawn by the report that are shown smaller than MEDIA_TARGET_DPI allows are
+#       downsampled to that resolution, and reduced to a 256 color palette (MEDIA_QUANTIZE_CHARTS).
+#       The template's own pictures are left as they are unless MEDIA_OPTIMIZE_TEMPLATE_IMAGES
+#       is set (and then only plain uncropped slide pictures, whose on-slide size is known).
+#     - media is stored in the zip as is instead of deflated again, unless a quick probe of its
+#       first bytes shows it is not compressed well already (template PNGs often are not)
+#    An optimized image only replaces the original when it is smaller.
+#
+#    Merging images and choosing the zip compression go through python-pptx internals (tested with
+#    python-pptx 1.0.2). When they are missing or have changed, the report is saved with
+#    prs.save() instead, without packing.
+
+try:
+    from pptx.opc.package import _Relationship
+    from pptx.opc.serialized import PackageWriter, _ZipPkgWriter
+except ImportError:
+    _Relationship = PackageWriter = _ZipPkgWriter = None
+
+#Picture name given to charts placed by ppt_edit.insert_chart_to_slide
+CHART_PICTURE_PREFIX = "Chart "
+
+_STORED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'tif', 'tiff', 'wdp', 'mp4', 'm4a', 'mp3', 'xlsx'}
+_PIL_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG'}
+_PROBE_BYTES = 64 * 1024
+
+
+def _compression(pack_uri, blob):
+    if pack_uri.ext.lower() not in _STORED_EXTENSIONS:
+        return zipfile.ZIP_DEFLATED
+    probe = blob[:_PROBE_BYTES]
+    if probe and len(zlib.compress(probe, 1)) < 0.9 * len(probe):
+        return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED
+
+
+if _Relationship is not None:
+    class _MediaZipWriter(_ZipPkgWriter):
+        def write(self, pack_uri, blob):
+            self._zipf.writestr(pack_uri.membername, blob, compress_type=_compression(pack_uri, blob))
+
+    class _MediaPackageWriter(PackageWriter):
+        def _write(self):
+            with _MediaZipWriter(self._pkg_file) as phys_writer:
+                self._write_content_types_stream(phys_writer)
+                self._write_pkg_rels(phys_writer)
+                self._write_parts(phys_writer)
+
+
+def _image_relationships(package):
+    for part in package.iter_parts():
+        for rId, rel in part.rels.items():
+            if not rel.is_external and isinstance(rel.target_part, ImagePart):
+                yield part, rId, rel
+
+
+#Point every relationship to the first of any identical images
+def deduplicate_images(package):
+    first = {}
+    merged = set()
+    for part, rId, rel in list(_image_relationships(package)):
+        image_part = rel.target_part
+        digest = hashlib.sha256(image_part.blob).hexdigest()
+        kept = first.setdefault(digest, image_part)
+        if kept is not image_part:
+            #Same rId, so the slide XML referencing it stays as is
+            part.rels._rels[rId] = _Relationship(part.rels._base_uri, rId, rel.reltype, RTM.INTERNAL, kept)
+            merged.add(image_part.partname)
+    return len(merged)
+
+
+def _is_cropped(picture):
+    return any((picture.crop_left, picture.crop_right, picture.crop_top, picture.crop_bottom))
+
+
+#Largest on-slide size (EMU) of every image part, and whether it is a report chart
+#    Images that are also used anywhere else (layouts, backgrounds, cropped pictures) are left
+#    out, since the size they are shown at there is not known.
+def _picture_extents(prs):
+    extents = {}
+    charts = set()
+    for slide in prs.slides:
+        for shape in walk_shapes(slide.shapes):
+            if shape.shape_type != 13 or _is_cropped(shape):  # Picture
+                continue
+            key = (slide.part, shape._element.blip_rId)
+            width, height = extents.get(key, (0, 0))
+            extents[key] = (max(width, shape.width), max(height, shape.height))
+            if shape.name.startswith(CHART_PICTURE_PREFIX):
+                charts.add(key)
+
+    sizes = {}
+    unknown = set()
+    chart_parts = set()
+    for part, rId, rel in _image_relationships(prs.part.package):
+        image_part = rel.target_part
+        if (part, rId) not in extents:
+            unknown.add(image_part)
+            continue
+        width, height = sizes.get(image_part, (0, 0))
+        sizes[image_part] = (max(width, extents[(part, rId)][0]), max(height, extents[(part, rId)][1]))
+        if (part, rId) in charts:
+            chart_parts.add(image_part)
+    return {part: size for part, size in sizes.items() if part not in unknown}, chart_parts - unknown
+
+
+#Smaller version of an image for its on-slide size, or None when it would not be smaller
+def optimize_image(blob, ext, extent, dpi, quantize=False):
+    image_format = _PIL_FORMATS.get(ext.lower())
+    if image_format is None:
+        return None
+    image = Image.open(io.BytesIO(blob))
+    quantize = quantize or image.mode == 'P'  # Palette images stay palette images when resized
+    changed = False
+
+    if dpi:
+        scale = max(Emu(extent[0]).inches * dpi / image.width, Emu(extent[1]).inches * dpi / image.height)
+        if scale < 0.9:
+            size = (max(1, math.ceil(image.width * scale)), max(1, math.ceil(image.height * scale)))
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB').resize(size, Image.LANCZOS)
+            changed = True
+
+    if quantize and image_format == 'PNG' and image.mode != 'P':
+        if image.mode == 'RGBA' and image.getextrema()[3][0] == 255:
+            image = image.convert('RGB')
+        method = Image.Quantize.FASTOCTREE if image.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+        image = image.convert('RGBA' if image.mode == 'RGBA' else 'RGB').quantize(256, method=method)
+        changed = True
+
+    if not changed:
+        return None
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(buffer, 'JPEG', quality=90, optimize=True, dpi=(dpi, dpi))
+    else:
+        image.save(buffer, 'PNG', optimize=True, dpi=(dpi or 96, dpi or 96))
+    optimized = buffer.getvalue()
+    return optimized if len(optimized) < len(blob) else None
+
+
+def optimize_images(prs, dpi=None, quantize_charts=None, template_images=None):
+    dpi = settings.MEDIA_TARGET_DPI if dpi is None else dpi
+    quantize_charts = settings.MEDIA_QUANTIZE_CHARTS if quantize_charts is None else quantize_charts
+    if template_images is None:
+        template_images = settings.MEDIA_OPTIMIZE_TEMPLATE_IMAGES
+    sizes, chart_parts = _picture_extents(prs)
+
+    optimized = 0
+    saved = 0
+    for image_part, extent in sizes.items():
+        if image_part not in chart_parts and not template_images:
+            continue
+        try:
+            blob = optimize_image(image_part.blob, image_part.partname.ext, extent, dpi,
+                                  quantize=quantize_charts and image_part in chart_parts)
+        except Exception as e:
+            print(f"Could not optimize {image_part.partname}: {e}")
+            continue
+        if blob is not None:
+            saved += len(image_part.blob) - len(blob)
+            image_part._blob = blob
+            optimized += 1
+    return optimized, saved
+
+
+#Save the presentation through the packaging stage
+#    Parameters:
+#     - prs (Presentation): The finished report
+#     - filename (str or file): Where to write the .pptx
+def save_presentation(prs, filename):
+    if _Relationship is None:
+        print("Packing is not supported by this python-pptx version, saving media as is")
+        prs.save(filename)
+        return
+
+    try:
+        package = prs.part.package
+        merged = deduplicate_images(package)
+        optimized, saved = optimize_images(prs)
+        _MediaPackageWriter.write(filename, package._rels, tuple(package.iter_parts()))
+    except (AttributeError, TypeError) as e:
+        #Merged relationships are complete on their own, so the package can still be saved
+        print(f"Packing failed ({e}), saving media as is")
+        if hasattr(filename, 'seek'):
+            filename.seek(0)
+            filename.truncate()
+        prs.save(filename)
+        return
+
+    print(f"Packed media: {merged} duplicate images merged, {optimized} images optimized "
+          f"({saved / 1024:.0f} KB saved)")
@@ -0,0 +1,90 @@
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+#Dependency-graph scheduler
+#    Tasks run on a bounded thread pool as soon as all of their dependencies have finished,
+#    and receive the dependency results as positional arguments (in the order listed).
+#    Tasks that share a lane never run at the same time; this serializes work on objects
+#    that are not thread safe (the presentation, matplotlib's pyplot state) while the
+#    network-bound collectors run in parallel. A lane can also be given a higher limit, e.g. to
+#    cap the tasks running against one AWS account. A task is only handed to a worker once its
+#    lanes have room, so tasks waiting for a lane never hold a worker. A failed task is reported and every task
+#    depending on it is skipped. Tasks inherit the context (e.g. the AWS target) of run().
+#    run(keep=[...]) only returns the listed results and drops every other one as soon as the
+#    tasks depending on it have started, so intermediate data is not held until the run ends.
+
+class Pipeline:
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.lane_limits = {}
+
+    def add(self, name, func, deps=(), lanes=()):
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+        self.tasks[name] = (func, tuple(deps), tuple(lanes))
+        for lane in lanes:
+            self.lane_limits.setdefault(lane, 1)
+        return name
+
+    #Let up to limit tasks of a lane run at the same time (1 unless set)
+    def set_lane_limit(self, lane, limit):
+        self.lane_limits[lane] = max(1, limit)
+
+    def run(self, keep=None):
+        results = {}
+        failed = set()
+        pending = dict(self.tasks)
+        running = {}
+        lane_use = dict.fromkeys(self.lane_limits, 0)
+        dependents = dict.fromkeys(self.tasks, 0)
+        for _, deps, _ in self.tasks.values():
+            for dep in deps:
+                dependents[dep] += 1
+
+        def release(name):
+            if keep is not None and not dependents[name] and name not in keep:
+                results.pop(name, None)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, (func, deps, lanes) in list(pending.items()):
+                    if any(dep in failed for dep in deps):
+                        print(f"Skipping '{name}' because a dependency failed")
+                        failed.add(name)
+                        del pending[name]
+                        for dep in deps:
+                            dependents[dep] -= 1
+                            release(dep)
+                    elif all(dep in results for dep in deps) and all(
+                            lane_use[lane] < self.lane_limits[lane] for lane in lanes):
+                        for lane in lanes:
+                            lane_use[lane] += 1
+                        args = [results[dep] for dep in deps]
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, func, *args)] = name
+                        del pending[name]
+                        for dep in deps:
+                            dependents[dep] -= 1
+                            release(dep)
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Unresolvable dependencies for: {', '.join(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    for lane in self.tasks[name][2]:
+                        lane_use[lane] -= 1
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print(f"Error in pipeline task '{name}': {e}")
+                        failed.add(name)
+                    release(name)
+
+        return results
@@ -1,17 +1,69 @@
-import matplotlib.pyplot as plt
-
-def plot_metrics(metrics_data_dict, title, output_path):
-    plt.figure(figsize=(10, 4))
-    for metric_name, data in metrics_data_dict.items():
-        if data:
-            timestamps, values = zip(*data)
-            plt.plot(timestamps, values, label=metric_name)
-
-    plt.title(title)
-    plt.xlabel("Date")
-    plt.ylabel("Usage (%)")
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close()
+import io
+import threading
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+#Chart renderers
+#    Renderers draw on Agg figures that are kept per thread, chart kind and figure size and are
+#    cleared between charts, instead of pyplot's global figure, so charts can be drawn in worker processes (see
+#    utils/chart_render.py) without setting up a figure per chart. They take the chart title,
+#    its data and a style dict, and return the PNG bytes.
+
+_figures = threading.local()
+
+
+def _axes(kind, figsize):
+    cache = _figures.__dict__.setdefault('axes', {})
+    if (kind, figsize) not in cache:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        cache[(kind, figsize)] = (fig, fig.add_subplot())
+    fig, ax = cache[(kind, figsize)]
+    ax.clear()
+    return fig, ax
+
+
+def render_line_chart(title, data, style):
+    fig, ax = _axes('line', tuple(style.get('figsize', (10, 4))))
+    for metric_name, points in data.items():
+        if points:
+            timestamps, values = zip(*points)
+            ax.plot(timestamps, values, label=metric_name)
+
+    ax.set_title(title)
+    ax.set_xlabel(style.get('xlabel', "Date"))
+    ax.set_ylabel(style.get('ylabel', "Usage (%)"))
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+#data: label -> wedge size
+def render_pie_chart(title, data, style):
+    fig, ax = _axes('pie', tuple(style.get('figsize', (6.4, 4.8))))
+    labels = list(data.keys())
+    colors = style.get('colors') or matplotlib.colormaps[style.get('colormap', 'tab20')].colors[:len(labels)]
+
+    ax.pie(list(data.values()), labels=labels, colors=colors, autopct='%1.1f%%',
+           startangle=style.get('startangle', 0), textprops=style.get('textprops'))
+    if style.get('equal_axes'):
+        ax.axis('equal')
+    if title:
+        ax.set_title(title)
+    return _to_png(fig, bbox_inches=style.get('bbox_inches'))
+
+
+def _to_png(fig, **savefig_options):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', **savefig_options)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'line': render_line_chart,
+    'pie': render_pie_chart,
+}
+
@@ -1,73 +1,78 @@
 from pptx.util import Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
-import os
+import io
+import math
+import re
+from copy import deepcopy
 from pptx.enum.shapes import MSO_AUTO_SHAPE_TYPE
-
-import matplotlib.pyplot as plt
+from pptx.oxml.ns import qn
+from pptx.table import _Cell
 
 from pptx.util import Inches
 
-def insert_image_to_slide(slide, image_path, prs):
-    if not os.path.exists(image_path):
-        print(f"Image file not found: {image_path}")
-        return
-
-    #Get slide dimensions
-    slide_width = prs.slide_width
-    slide_height = prs.slide_height
-
-    #Set image dimensions
-    image_width = Inches(9.5)
-    image_height = Inches(3.5)
-
-    #Center the image
-    left = (slide_width - image_width) / 2
-    top = (slide_height - image_height) / 2
-
-    slide.shapes.add_picture(image_path, left, top, width=image_width, height=image_height)
+from utils.chart_render import ChartJob, prepare_charts
+from utils.native_charts import add_native_chart
+from utils.packaging import CHART_PICTURE_PREFIX
+
+#Place a prepared chart (see chart_render.prepare_charts): the image when there is one,
+#otherwise a native chart drawn from the job. Centered unless a position is given.
+def insert_chart_to_slide(slide, job, png, prs, left=None, top=None, width=Inches(9.5), height=Inches(3.5)):
+    if left is None:
+        left = (prs.slide_width - width) // 2
+    if top is None:
+        top = (prs.slide_height - height) // 2
+
+    if png is None:
+        add_native_chart(slide, job, left, top, width, height)
+    else:
+        picture = slide.shapes.add_picture(io.BytesIO(png), left, top, width=width, height=height)
+        picture.name = f"{CHART_PICTURE_PREFIX}{job.key}"
+
+#Positions for charts sharing a slide
+#    A single chart keeps the default centered placement; several are laid out in a grid
+#    below the slide's label area.
+#
+#     Returns:
+#     - list of dict: left/top/width/height keyword arguments for insert_chart_to_slide
+
+def grid_layout(prs, count, top=Inches(2.2), margin=Inches(0.4)):
+    if count <= 1:
+        return [{}] * count
+
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    cell_width = (prs.slide_width - margin * (columns + 1)) // columns
+    cell_height = (prs.slide_height - top - margin * rows) // rows
+    return [
+        {
+            'left': margin + (index % columns) * (cell_width + margin),
+            'top': top + (index // columns) * (cell_height + margin),
+            'width': cell_width,
+            'height': cell_height,
+        }
+        for index in range(count)
+    ]
 
 def update_textbox_with_resource_name(slide, label_prefix, resource_name):
     for shape in slide.shapes:
         if shape.has_text_frame and label_prefix in shape.text:
-            tf = shape.text_frame
-            tf.clear()
-            p = tf.paragraphs[0]
-            run = p.add_run()
-            run.text = f"{label_prefix} {resource_name}"
-            font = run.font
-            font.name = "Inter"
-            font.size = Pt(48)
-            font.bold = True
-            p.alignment = PP_ALIGN.LEFT
+            set_resource_name(shape, label_prefix, resource_name)
             return True
     return False
 
 
-def find_slide_by_title(prs, target_title):
-    target_title_lower = target_title.lower().strip()
-
-    for slide_idx, slide in enumerate(prs.slides):
-        for shape in slide.shapes:
-            try:
-                if hasattr(shape, 'text') and shape.text:
-                    shape_text = shape.text.lower().strip()
-                    if target_title_lower in shape_text or shape_text in target_title_lower:
-                        print(f"Found slide with title: '{shape.text}' (slide {slide_idx + 1})")
-                        return slide
-
-                if hasattr(shape, 'is_placeholder') and shape.is_placeholder:
-                    if shape.placeholder_format.type == 1:
-                        if hasattr(shape, 'text') and shape.text:
-                            shape_text = shape.text.lower().strip()
-                            if target_title_lower in shape_text or shape_text in target_title_lower:
-                                print(f"Found slide with title placeholder: '{shape.text}' (slide {slide_idx + 1})")
-                                return slide
-            except (AttributeError, ValueError):
-                continue
-
-    print(f"Could not find slide with title containing: '{target_title}'")
-    return None
+def set_resource_name(shape, label_prefix, resource_name):
+    tf = shape.text_frame
+    tf.clear()
+    p = tf.paragraphs[0]
+    run = p.add_run()
+    run.text = f"{label_prefix} {resource_name}"
+    font = run.font
+    font.name = "Inter"
+    font.size = Pt(48)
+    font.bold = True
+    p.alignment = PP_ALIGN.LEFT
 
 
 def find_table_in_slide(slide):
@@ -77,38 +82,27 @@ def find_table_in_slide(slide):
     return None
 
 
-def adjust_table_rows(table, data_count):
-    current_rows = len(table.rows)
-    needed_rows = data_count + 1
-
-    if current_rows < needed_rows:
-        rows_to_add = needed_rows - current_rows
-        print(f"Adding {rows_to_add} rows to table")
-        for _ in range(rows_to_add):
-            try:
-                last_row = table.rows[-1]._tr
-                new_row = last_row.__class__(last_row.xml, last_row)
-                table._tbl.append(new_row)
-            except Exception as e:
-                print(f"Error adding row: {e}")
-                break
-
-    elif current_rows > needed_rows >= 1:
-        rows_to_remove = current_rows - needed_rows
-        max_removable = current_rows - 1
-        actual_rows_to_remove = min(rows_to_remove, max_removable)
-
-        if actual_rows_to_remove > 0:
-            print(f"Removing {actual_rows_to_remove} empty rows from table")
-            try:
-                for _ in range(actual_rows_to_remove):
-                    if len(table.rows) > 1:
-                        row_to_remove = table.rows[-1]._tr
-                        table._tbl.remove(row_to_remove)
-                    else:
-                        break
-            except Exception as e:
-                print(f"Error removing rows: {e}")
+#Insert columns in front of a table's existing ones
+#    The new cells are copies of the first column's, so they keep its styling. Column widths
+#    are scaled so the table keeps its total width.
+
+def add_table_columns(table, headers):
+    tbl = table._tbl
+    total_width = sum(column.width for column in table.columns)
+
+    for _ in headers:
+        tbl.tblGrid.insert(0, deepcopy(tbl.tblGrid.gridCol_lst[0]))
+        for tr in tbl.tr_lst:
+            tr.insert(0, deepcopy(tr.tc_lst[0]))
+
+    new_width = sum(column.width for column in table.columns)
+    for column in table.columns:
+        column.width = int(column.width * total_width / new_width)
+
+    for col_idx, header in enumerate(headers):
+        table.cell(0, col_idx).text = header
+
+
 def update_resource_counts_on_slide(prs, slide_index, ec2_count, rds_count, total_bill_amount=None):
     slide = prs.slides[slide_index]
 
@@ -158,7 +152,51 @@ def update_resource_counts_on_slide(prs, slide_index, ec2_count, rds_count, tota
     print(f"   - RDS databases: {rds_count}")
     # if total_bill_amount is not None:
     #     print(f"   - Total Bill Amount: ${total_bill_amount:,.2f}")
-def fill_existing_table(slide, data, keys, slide_title):
+#Characters XML 1.0 does not allow in text
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+#Pre-styled data row
+#    A copy of the table's first data row (the header row when there is none) with every cell
+#    reduced to one centered 11pt run; shaded rows also get the light grey fill. Data rows are
+#    deep copies of it with only the run text set, so styling goes through python-pptx once per
+#    table instead of once per cell.
+
+def _template_row(table, shaded):
+    trs = table._tbl.tr_lst
+    tr = deepcopy(trs[1] if len(trs) > 1 else trs[0])
+    for tc in tr.tc_lst:
+        cell = _Cell(tc, None)
+        cell.text = ""
+        para = cell.text_frame.paragraphs[0]
+        para.font.size = Pt(11)
+        para.alignment = PP_ALIGN.CENTER
+        run = para.add_run()
+        run.font.size = Pt(11)
+        if shaded:
+            cell.fill.solid()
+            cell.fill.fore_color.rgb = RGBColor(240, 240, 240)
+    return tr
+
+
+def _build_row(template, values):
+    tr = deepcopy(template)
+    for text_element, value in zip(tr.iter(qn('a:t')), values):
+        text_element.text = _INVALID_XML_CHARS.sub('', value)
+    return tr
+
+
+#Data rows that fit on the slide below the table's header row
+def table_rows_per_slide(prs, table_shape):
+    rows = table_shape.table.rows
+    data_row_height = rows[1].height if len(rows) > 1 else rows[0].height
+    available = prs.slide_height - table_shape.top - rows[0].height
+    return max(1, available // max(1, data_row_height))
+
+
+#Replace the data rows of the slide's table
+#    rows: cell text of each row, in column order (extra cells past the table's columns are dropped)
+def fill_existing_table(slide, rows, slide_title):
     table_shape = find_table_in_slide(slide)
 
     if not table_shape:
@@ -166,82 +204,53 @@ def fill_existing_table(slide, data, keys, slide_title):
         return False
 
     table = table_shape.table
+    tbl = table._tbl
     print(f"Found existing table with {len(table.rows)} rows and {len(table.columns)} columns")
 
-    if not data:
+    if rows and len(table.columns) < len(rows[0]):
+        print(f"Warning: Table has {len(table.columns)} columns but need {len(rows[0])}")
+
+    plain_row = _template_row(table, shaded=False)
+    shaded_row = _template_row(table, shaded=True)
+
+    if rows:
+        trs = [
+            _build_row(shaded_row if row_idx % 2 == 0 else plain_row, cells)
+            for row_idx, cells in enumerate(rows, start=1)
+        ]
+    else:
         print(f"No data available for '{slide_title}', keeping header only")
-        try:
-            while len(table.rows) > 1:
-                row_to_remove = table.rows[-1]._tr
-                table._tbl.remove(row_to_remove)
-
-            if len(table.rows) == 1:
-                last_row = table.rows[-1]._tr
-                new_row = last_row.__class__(last_row.xml, last_row)
-                table._tbl.append(new_row)
-
-            for col_idx in range(min(len(table.columns), len(keys))):
-                cell = table.cell(1, col_idx)
-                cell.text = "No data available" if col_idx == 0 else ""
-        except Exception as e:
-            print(f"Error clearing table: {e}")
-        return True
-
-    try:
-        adjust_table_rows(table, len(data))
-    except Exception as e:
-        print(f"Error adjusting table rows: {e}")
-
-    if len(table.columns) < len(keys):
-        print(f"Warning: Table has {len(table.columns)} columns but need {len(keys)}")
-        keys = keys[:len(table.columns)]
-
-    for row_idx, item in enumerate(data, start=1):
-        if row_idx >= len(table.rows):
-            print(f"Warning: Not enough rows in table for all data (need {len(data) + 1}, have {len(table.rows)})")
-            break
-
-        for col_idx, key in enumerate(keys):
-            if col_idx >= len(table.columns):
-                break
-
-            try:
-                text = str(item.get(key, "N/A"))
-                cell = table.cell(row_idx, col_idx)
-                cell.text = text
-
-                para = cell.text_frame.paragraphs[0]
-                para.font.size = Pt(11)
-                para.alignment = PP_ALIGN.CENTER
-
-                if row_idx % 2 == 0:
-                    cell.fill.solid()
-                    cell.fill.fore_color.rgb = RGBColor(240, 240, 240)
-            except Exception as e:
-                print(f"Error filling cell [{row_idx}, {col_idx}]: {e}")
-
-    print(f"Successfully filled table in '{slide_title}' with {len(data)} data rows")
+        trs = [_build_row(plain_row, ["No data available"])]
+
+    #Everything below the header is replaced in one pass
+    for tr in tbl.tr_lst[1:]:
+        tbl.remove(tr)
+    for tr in trs:
+        tbl.append(tr)
+
+    if rows:
+        print(f"Successfully filled table in '{slide_title}' with {len(rows)} data rows")
     return True
 
 
+#Place a single chart, unless it failed to render
+def _add_chart(slide, job, prs, **position):
+    prepared = prepare_charts([job])
+    if job.key in prepared:
+        insert_chart_to_slide(slide, job, prepared[job.key], prs, **position)
+
+
 def add_optimization_pie_chart(prs, slide_index, categorized_resources):
     slide = prs.slides[slide_index]
 
-    labels = []
-    sizes = []
+    sizes = {}
     colors = ["#4CAF50", "#FFC107", "#F44336", "#9E9E9E"]
 
     for category in ["Optimized", "Under Provisioned", "Over Provisioned", "No Recommendation"]:
-        labels.append(category)
-        sizes.append(len(categorized_resources.get(category, [])))
-
-    plt.figure(figsize=(4, 4))
-    plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%')
-    chart_path = "output/resource_distribution_pie.png"
-    plt.savefig(chart_path)
-    plt.close()
+        sizes[category] = len(categorized_resources.get(category, []))
 
-    insert_image_to_slide(slide, chart_path, prs, left=Inches(0.5), top=Inches(1.5))  # Adjust if needed
+    _add_chart(slide, ChartJob("resource_distribution_pie", 'pie', None, sizes, {'figsize': (4, 4), 'colors': colors}),
+               prs, left=Inches(0.5), top=Inches(1.5), width=Inches(4), height=Inches(4))  # Adjust if needed
 
     # Populate textboxes for each category
     for shape in slide.shapes:
@@ -258,21 +267,10 @@ def add_billing_summary_to_slide(prs, slide_index, billing_data):
     slide = prs.slides[slide_index]
 
     # === Generate Pie Chart ===
-    labels = list(billing_data.keys())
-    values = list(billing_data.values())
-
-    colors = plt.get_cmap('tab20').colors[:len(labels)]
-
-    fig, ax = plt.subplots()
-    wedges, texts, autotexts = ax.pie(
-        values, labels=labels, autopct='%1.1f%%',
-        startangle=90, colors=colors, textprops={'fontsize': 8}
-    )
-    ax.axis('equal')
-
-    chart_path = "output/billing_summary_pie.png"
-    plt.savefig(chart_path, bbox_inches='tight')
-    plt.close()
+    chart = ChartJob("billing_summary_pie", 'pie', None, billing_data, {
+        'colormap': 'tab20', 'startangle': 90, 'textprops': {'fontsize': 8},
+        'equal_axes': True, 'bbox_inches': 'tight',
+    })
 
     # === Insert Pie Chart ===
     chart_left = Inches(5.5)
@@ -280,7 +278,7 @@ def add_billing_summary_to_slide(prs, slide_index, billing_data):
     chart_width = Inches(4)
     chart_height = Inches(4)
 
-    slide.shapes.add_picture(chart_path, chart_left, chart_top, width=chart_width, height=chart_height)
+    _add_chart(slide, chart, prs, left=chart_left, top=chart_top, width=chart_width, height=chart_height)
 
     # === Add Service Name and Amount Boxes on the Left ===
     left_x = Inches(0.5)
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from utils import settings
+
+#Error codes AWS services use to signal throttling
+THROTTLE_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'SlowDown',
+    'LimitExceededException',
+}
+
+
+#Token bucket for one (service, operation)
+#    Callers block in acquire() until a token is available, so calls queue instead of failing.
+#    The refill rate halves on every throttling response and recovers additively on success,
+#    never exceeding the configured quota.
+
+class TokenBucket:
+    def __init__(self, rate, min_rate=0.2):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def on_throttle(self):
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            return self.rate
+
+    def on_success(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def quota_for(service, operation):
+    limits = settings.RATE_LIMITS
+    return limits.get(f"{service}.{operation}", limits.get(service, limits['default']))
+
+
+#Shared limiter
+#    Parameters:
+#     - service (str): boto3 service name
+#     - operation (str): API operation name (e.g., 'GetMetricData')
+#     - scope (tuple): What the quota applies to, usually (region, credentials)
+#
+#     Returns:
+#     - TokenBucket shared by every caller of that operation in that scope
+
+def get_limiter(service, operation, scope=None):
+    key = (service, operation, scope)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(quota_for(service, operation))
+            _buckets[key] = bucket
+    return bucket
+
+
+#Hook a client into the rate limiter
+#    Every API call waits for a token in before-call, and every attempt's response is
+#    inspected in needs-retry to adapt the rate. Retries themselves are left to botocore.
+
+def register_client(client, scope=None):
+    service = client.meta.service_model.service_name
+
+    def before_call(model, **kwargs):
+        get_limiter(service, model.name, scope).acquire()
+
+    def after_attempt(response, operation, **kwargs):
+        if response is None:
+            return None
+        limiter = get_limiter(service, operation.name, scope)
+        code = response[1].get('Error', {}).get('Code')
+        if code in THROTTLE_CODES:
+            rate = limiter.on_throttle()
+            print(f"Throttled on {service}.{operation.name} ({code}), slowing to {rate:.2f} calls/s")
+        elif code is None:
+            limiter.on_success()
+        return None
+
+    client.meta.events.register('before-call', before_call)
+    client.meta.events.register('needs-retry', after_attempt)
+    return client
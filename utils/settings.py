@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+
+#Run-wide settings. Each one can be overridden through an environment variable;
+#main.py also sets some of them from command line flags.
+
+#Directory for on-disk caches shared between runs
+CACHE_DIR = os.environ.get('AWS_REPORT_CACHE_DIR', '.cache')
+
+#CloudWatch datapoint cache
+METRIC_CACHE_ENABLED = os.environ.get('AWS_REPORT_METRIC_CACHE', '1') != '0'
+METRIC_CACHE_RETENTION_DAYS = int(os.environ.get('AWS_REPORT_METRIC_CACHE_RETENTION_DAYS', '35'))
+
+#Cost Explorer daily cost history: recent days are fetched again on every sync because
+#Cost Explorer revises them; days older than the retention period are dropped
+COST_CACHE_ENABLED = os.environ.get('AWS_REPORT_COST_CACHE', '1') != '0'
+COST_RESTATEMENT_DAYS = int(os.environ.get('AWS_REPORT_COST_RESTATEMENT_DAYS', '3'))
+COST_HISTORY_RETENTION_DAYS = int(os.environ.get('AWS_REPORT_COST_HISTORY_RETENTION_DAYS', '400'))
+
+#How long Compute Optimizer recommendations are reused (AWS refreshes them about daily); 0 disables
+OPTIMIZATION_CACHE_TTL_HOURS = float(os.environ.get('AWS_REPORT_OPTIMIZATION_CACHE_TTL_HOURS', '12'))
+
+#Ignore cached data and fetch everything again (cached entries are replaced)
+REFRESH_CACHE = os.environ.get('AWS_REPORT_REFRESH_CACHE', '0') == '1'
+
+#boto3 clients: connection pool size per client and retry behaviour
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_REPORT_MAX_POOL_CONNECTIONS', '50'))
+AWS_RETRY_MODE = os.environ.get('AWS_REPORT_RETRY_MODE', 'adaptive')
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_REPORT_MAX_ATTEMPTS', '10'))
+
+#Worker threads for the report pipeline in main.py
+PIPELINE_WORKERS = int(os.environ.get('AWS_REPORT_PIPELINE_WORKERS', '8'))
+
+
+#API call quotas in calls per second, per service or per "service.Operation".
+#Override with e.g. AWS_REPORT_RATE_LIMITS="ce=2,cloudwatch.GetMetricData=20"
+def _rate_limits(overrides):
+    limits = {
+        'default': 10.0,
+        'ce': 5.0,
+        'cloudwatch': 20.0,
+        'cloudwatch.GetMetricData': 50.0,
+        'compute-optimizer': 5.0,
+        'iam': 10.0,
+        'backup': 10.0,
+        'ec2': 20.0,
+        'rds': 10.0,
+        'eks': 10.0,
+        'sts': 10.0,
+    }
+    for item in filter(None, (part.strip() for part in overrides.split(','))):
+        name, _, value = item.partition('=')
+        limits[name.strip()] = float(value)
+    return limits
+
+
+RATE_LIMITS = _rate_limits(os.environ.get('AWS_REPORT_RATE_LIMITS', ''))
+
+#How far back the AWS Backup sweep looks for backup jobs and recovery points
+BACKUP_LOOKBACK_DAYS = int(os.environ.get('AWS_REPORT_BACKUP_LOOKBACK_DAYS', '35'))
+
+#Multi-account / multi-region fan-out (comma separated lists; main.py flags override these)
+FANOUT_ACCOUNTS = [a.strip() for a in os.environ.get('AWS_REPORT_ACCOUNTS', '').split(',') if a.strip()]
+FANOUT_REGIONS = [r.strip() for r in os.environ.get('AWS_REPORT_REGIONS', '').split(',') if r.strip()]
+FANOUT_ROLE_NAME = os.environ.get('AWS_REPORT_ROLE_NAME', '')
+#Tasks that may run at once against the same account
+FANOUT_MAX_PER_ACCOUNT = int(os.environ.get('AWS_REPORT_MAX_PER_ACCOUNT', '4'))
+
+#Chart backend per chart kind: 'image' (matplotlib PNG) or 'native' (editable PowerPoint chart)
+def _chart_backends(overrides):
+    backends = {'line': 'image', 'pie': 'image'}
+    for item in filter(None, (part.strip() for part in overrides.split(','))):
+        kind, _, backend = item.partition('=')
+        if backend.strip() not in ('image', 'native'):
+            raise ValueError(f"Unknown chart backend '{backend.strip()}' for '{kind.strip()}'")
+        backends[kind.strip()] = backend.strip()
+    return backends
+
+
+CHART_BACKENDS = _chart_backends(os.environ.get('AWS_REPORT_CHART_BACKENDS', ''))
+
+#Graphs per EC2/RDS graph slide; the template slide is copied for every further page
+GRAPHS_PER_SLIDE = int(os.environ.get('AWS_REPORT_GRAPHS_PER_SLIDE', '1'))
+
+#Data rows per table slide before rows continue on a copy of the slide (0 = as many as fit)
+TABLE_ROWS_PER_SLIDE = int(os.environ.get('AWS_REPORT_TABLE_ROWS_PER_SLIDE', '0'))
+
+#Slide/shape lookups of a template saved next to the caches, keyed by the template's hash
+TEMPLATE_MANIFEST_ENABLED = os.environ.get('AWS_REPORT_TEMPLATE_MANIFEST', '1') != '0'
+
+#Saving: resolution report charts are downsampled to (0 = keep as rendered), whether they are
+#reduced to a 256 color palette, and whether the template's own pictures are downsampled too
+MEDIA_TARGET_DPI = int(os.environ.get('AWS_REPORT_MEDIA_DPI', '150'))
+MEDIA_QUANTIZE_CHARTS = os.environ.get('AWS_REPORT_MEDIA_QUANTIZE', '1') != '0'
+MEDIA_OPTIMIZE_TEMPLATE_IMAGES = os.environ.get('AWS_REPORT_MEDIA_OPTIMIZE_TEMPLATE', '0') == '1'
+
+#Rendered charts kept on disk between runs (least recently used are dropped past the size limit)
+CHART_CACHE_ENABLED = os.environ.get('AWS_REPORT_CHART_CACHE', '1') != '0'
+CHART_CACHE_MAX_MB = float(os.environ.get('AWS_REPORT_CHART_CACHE_MAX_MB', '200'))
+
+#Chart rendering: worker processes (0 = one per core, 1 = render in-process) and how they start
+CHART_WORKERS = int(os.environ.get('AWS_REPORT_CHART_WORKERS', '0'))
+CHART_START_METHOD = os.environ.get(
+    'AWS_REPORT_CHART_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn',
+)
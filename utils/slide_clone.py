@@ -0,0 +1,89 @@
+from copy import deepcopy
+
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.oxml.ns import qn
+from pptx.parts.slide import SlidePart
+
+#Slide cloning
+#    Copies a slide's shape tree into new slides on the same layout. Relationships the shapes
+#    point to (images, hyperlinks) are re-created on each copy and the copied r:embed / r:id /
+#    r:link references are remapped to them; the media parts themselves are shared, not
+#    duplicated. Notes are not copied.
+#
+#    Slide parts are created directly rather than through Slides.add_slide, which scans every
+#    slide relationship and slide ID on each call and so grows quadratically with deck size.
+
+_RELATIONSHIP_ATTRIBUTES = [qn('r:embed'), qn('r:link'), qn('r:id')]
+_SKIPPED_RELATIONSHIPS = {RT.SLIDE_LAYOUT, RT.NOTES_SLIDE}
+
+
+def _copy_relationships(source, slide):
+    rId_map = {}
+    for rId, rel in source.part.rels.items():
+        if rel.reltype in _SKIPPED_RELATIONSHIPS:
+            continue
+        target = rel.target_ref if rel.is_external else rel.target_part
+        rId_map[rId] = slide.part.relate_to(target, rel.reltype, is_external=rel.is_external)
+    return rId_map
+
+
+def _copy_shapes(source, slide, rId_map):
+    source_tree = source.shapes._spTree
+    tree = slide.shapes._spTree
+
+    for element in source_tree.iterchildren():
+        if element.tag in (qn('p:nvGrpSpPr'), qn('p:grpSpPr'), qn('p:extLst')):
+            continue
+        element = deepcopy(element)
+        for node in element.iter():
+            for attribute in _RELATIONSHIP_ATTRIBUTES:
+                if node.get(attribute) in rId_map:
+                    node.set(attribute, rId_map[node.get(attribute)])
+        tree.insert_element_before(element, 'p:extLst')
+
+    background = source._element.cSld.bg
+    if background is not None:
+        slide._element.cSld.insert(0, deepcopy(background))
+
+
+def _partnames(presentation_part):
+    used = {part.partname for part in presentation_part.package.iter_parts()}
+    number = 0
+    while True:
+        number += 1
+        partname = PackURI(f"/ppt/slides/slide{number}.xml")
+        if partname not in used:
+            yield partname
+
+
+#Copies of a slide, placed right after it
+#    Parameters:
+#     - prs (Presentation): Presentation holding the slide
+#     - source (Slide): Slide to copy (copy it before filling it in)
+#     - count (int): Number of copies
+#
+#     Returns:
+#     - list: the new slides, in deck order
+
+def clone_slide(prs, source, count):
+    presentation_part = prs.part
+    slide_list = prs.slides._sldIdLst
+    partnames = _partnames(presentation_part)
+    next_id = max(slide_id.id for slide_id in slide_list) + 1
+    previous = slide_list[prs.slides.index(source)]
+
+    clones = []
+    for _ in range(count):
+        slide_part = SlidePart.new(next(partnames), presentation_part.package, source.slide_layout.part)
+        slide_id = slide_list._new_sldId()
+        slide_id.id = next_id
+        slide_id.rId = presentation_part.rels._add_relationship(RT.SLIDE, slide_part)
+        previous.addnext(slide_id)
+        previous = slide_id
+        next_id += 1
+
+        slide = slide_part.slide
+        _copy_shapes(source, slide, _copy_relationships(source, slide))
+        clones.append(slide)
+    return clones
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+
+from utils import settings
+
+#Template index
+#    Built once after the template is loaded: every text on every slide (group shapes
+#    included) is mapped to its slide and shape, and every slide to its table. Slides are
+#    looked up by their content, so lookups keep working when slides are reordered or pages
+#    are inserted. The maps only hold slide and shape IDs, so they are saved as a manifest
+#    next to the other caches, keyed by the template file's hash, and later runs on the same
+#    template skip the scan.
+
+#Part of the manifest key: bumped whenever scan() or the manifest layout changes, so manifests
+#written by an older version are a cache miss
+MANIFEST_VERSION = 1
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+#Every shape on a slide, with group shapes replaced by the shapes they contain
+def walk_shapes(shapes):
+    for shape in shapes:
+        if shape.shape_type == 6:  # Group shape
+            yield from walk_shapes(shape.shapes)
+        else:
+            yield shape
+
+
+#Shape with the given ID on a slide (copies of a slide keep their shapes' IDs)
+def find_shape(slide, shape_id):
+    for shape in walk_shapes(slide.shapes):
+        if shape.shape_id == shape_id:
+            return shape
+    return None
+
+
+class TemplateIndex:
+    def __init__(self, prs, titles, labels, tables):
+        self.slides = {slide.slide_id: slide for slide in prs.slides}
+        self.titles = titles  # normalized text -> slide ID (first slide it appears on)
+        self.labels = labels  # slide ID -> {normalized text: shape ID}
+        self.tables = tables  # slide ID -> shape ID of the slide's table
+
+    @classmethod
+    def scan(cls, prs):
+        titles, labels, tables = {}, {}, {}
+        for slide in prs.slides:
+            slide_labels = labels.setdefault(slide.slide_id, {})
+            for shape in walk_shapes(slide.shapes):
+                if shape.has_text_frame and shape.text.strip():
+                    text = normalize(shape.text)
+                    titles.setdefault(text, slide.slide_id)
+                    slide_labels.setdefault(text, shape.shape_id)
+                elif getattr(shape, 'has_table', False):
+                    tables.setdefault(slide.slide_id, shape.shape_id)
+        return cls(prs, titles, labels, tables)
+
+    def to_manifest(self):
+        return {
+            'version': MANIFEST_VERSION,
+            'titles': self.titles,
+            'labels': {str(slide_id): texts for slide_id, texts in self.labels.items()},
+            'tables': {str(slide_id): shape_id for slide_id, shape_id in self.tables.items()},
+        }
+
+    @classmethod
+    def from_manifest(cls, prs, manifest):
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Template manifest version {manifest.get('version')} is not {MANIFEST_VERSION}")
+        return cls(
+            prs,
+            manifest['titles'],
+            {int(slide_id): texts for slide_id, texts in manifest['labels'].items()},
+            {int(slide_id): shape_id for slide_id, shape_id in manifest['tables'].items()},
+        )
+
+    #Slide showing a text; falls back to partial matches of the text and a shape's text either way
+    def slide(self, text):
+        text = normalize(text)
+        slide_id = self.titles.get(text)
+        if slide_id is None:
+            slide_id = next((slide_id for title, slide_id in self.titles.items()
+                             if text in title or title in text), None)
+        return self.slides.get(slide_id)
+
+    #ID of the shape on a template slide whose text contains label_prefix
+    def label_shape_id(self, slide, label_prefix):
+        prefix = normalize(label_prefix)
+        texts = self.labels.get(slide.slide_id, {})
+        if prefix in texts:
+            return texts[prefix]
+        return next((shape_id for text, shape_id in texts.items() if prefix in text), None)
+
+    def table(self, slide):
+        shape_id = self.tables.get(slide.slide_id)
+        return find_shape(slide, shape_id) if shape_id is not None else None
+
+
+def _manifest_path(template_path):
+    with open(template_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return os.path.join(settings.CACHE_DIR, 'templates', f"{digest}-v{MANIFEST_VERSION}.json")
+
+
+#Index of a freshly loaded template, from its manifest when there is one
+def load_template_index(prs, template_path):
+    if not settings.TEMPLATE_MANIFEST_ENABLED:
+        return TemplateIndex.scan(prs)
+
+    path = _manifest_path(template_path)
+    try:
+        with open(path) as f:
+            return TemplateIndex.from_manifest(prs, json.load(f))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = TemplateIndex.scan(prs)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(index.to_manifest(), f)
+    except OSError as e:
+        print(f"Could not save template manifest: {e}")
+    return index